@@ -0,0 +1,62 @@
+"""
+Benchmarks of ``generate_html`` throughput and peak memory across
+the ``specs`` shapes.
+"""
+from canonical_args.frontend.html import cache, compile_spec, generate
+
+import specs
+
+
+class Generate(object):
+	params = [sorted(specs.SHAPES), specs.SIZES]
+	param_names = ["shape", "size"]
+
+	def setup(self, shape, size):
+		self.spec, self.form = specs.build(shape, size)
+		self.compiled = compile_spec(self.spec)
+		# warm the macro engine skeleton
+		generate.generate_html(self.compiled, engine="macro")
+
+	def time_generate_html(self, shape, size):
+		generate.generate_html(self.spec)
+
+	def time_generate_html_compiled(self, shape, size):
+		generate.generate_html(self.compiled)
+
+	def time_generate_html_macro(self, shape, size):
+		generate.generate_html(self.compiled, engine="macro")
+
+	def time_generate_html_macro_cold(self, shape, size):
+		generate.skeletons.clear()
+		generate.generate_html(self.compiled, engine="macro")
+
+	def time_generate_html_stream(self, shape, size):
+		for chunk in generate.generate_html_stream(self.compiled):
+			pass
+
+	def peakmem_generate_html(self, shape, size):
+		generate.generate_html(self.spec)
+
+
+class Edit(object):
+	"""
+	re-rendering after a single field of the spec is edited, with and
+	without a subtree cache.  A single call per sample, later calls
+	would find the edited subtrees cached too.
+	"""
+	number = 1
+	params = [sorted(specs.SHAPES), specs.SIZES]
+	param_names = ["shape", "size"]
+
+	def setup(self, shape, size):
+		self.spec, self.form = specs.build(shape, size)
+		self.compiled = compile_spec(self.spec)
+		self.edited = compile_spec(specs.edit(self.spec))
+		self.subtrees = cache.RenderCache(maxsize=100000)
+		generate.generate_html(self.compiled, subtree_cache=self.subtrees)
+
+	def time_generate_html_edited(self, shape, size):
+		generate.generate_html(self.edited)
+
+	def time_generate_html_edited_subtree_cache(self, shape, size):
+		generate.generate_html(self.edited, subtree_cache=self.subtrees)
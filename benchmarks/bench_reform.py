@@ -0,0 +1,35 @@
+"""
+Benchmarks of ``reform_from_html`` throughput and peak memory
+across the ``specs`` shapes.
+"""
+from canonical_args.frontend.html import compile_spec, format
+
+import specs
+
+
+class Reform(object):
+	params = [sorted(specs.SHAPES), specs.SIZES]
+	param_names = ["shape", "size"]
+
+	def setup(self, shape, size):
+		self.spec, self.form = specs.build(shape, size)
+		self.compiled = compile_spec(self.spec)
+		self.batch = [self.form] * 100
+		# generate the specialized function up front
+		format.reform_from_html(self.compiled, self.form, specialize=True)
+
+	def time_reform_from_html(self, shape, size):
+		format.reform_from_html(self.spec, self.form)
+
+	def time_reform_from_html_compiled(self, shape, size):
+		format.reform_from_html(self.compiled, self.form)
+
+	def time_reform_from_html_specialized(self, shape, size):
+		format.reform_from_html(self.compiled, self.form, specialize=True)
+
+	def time_reform_many(self, shape, size):
+		for reformed in format.reform_many(self.compiled, self.batch):
+			pass
+
+	def peakmem_reform_from_html(self, shape, size):
+		format.reform_from_html(self.spec, self.form)
@@ -0,0 +1,59 @@
+"""
+Compare the ``generate_html`` rendering engines on deeply nested
+specs: ``"nested"`` against a cold (single pass) ``"macro"`` render,
+the headline figure, and, for reference, a ``"macro"`` render from
+its kept skeleton, which only renders the ``cls`` leaves.
+
+	python benchmarks/engines.py [depth ...]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+# the checkout, and ``specs``, rather than an installed package
+sys.path[:0] = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+				os.path.dirname(os.path.abspath(__file__))]
+
+from canonical_args.frontend.html import compile_spec, generate
+
+from specs import nested_spec
+
+
+def bench(depth, number=20):
+	"""
+	:returns: ``dict`` of seconds per render for the ``"nested"``
+		engine, and the ``"macro"`` engine with no skeleton (``"cold"``,
+		the single pass) and with its skeleton kept (``"warm"``).
+	"""
+	compiled = compile_spec(nested_spec(depth))
+
+	def cold():
+		generate.skeletons.clear()
+		generate.generate_html(compiled, engine="macro")
+
+	timers = {
+		"nested": lambda: generate.generate_html(compiled, engine="nested"),
+		"cold": cold,
+		"warm": lambda: generate.generate_html(compiled, engine="macro")
+	}
+	results = {}
+	for name, func in timers.items():
+		timer = timeit.Timer(func)
+		results[name] = min(timer.repeat(repeat=3, number=number)) / number
+	return results
+
+
+if __name__ == "__main__":
+	depths = [int(arg) for arg in sys.argv[1:]] or [2, 5, 10, 20, 40]
+	print("{:>6} {:>12} {:>12} {:>10} {:>12}".format(
+		"depth", "nested (ms)", "cold (ms)", "cold/nested", "warm (ms)"))
+	for depth in depths:
+		results = bench(depth)
+		print("{:>6} {:>12.3f} {:>12.3f} {:>10.2f}x {:>12.3f}".format(
+			depth,
+			results["nested"] * 1000,
+			results["cold"] * 1000,
+			results["cold"] / results["nested"],
+			results["warm"] * 1000))
@@ -0,0 +1,135 @@
+"""
+Run the ``bench_*`` benchmarks, printing the best time per call of
+every ``time_`` benchmark, and the peak memory of every ``peakmem_``
+benchmark, for every parameter combination.
+
+	python benchmarks/run.py [pattern]
+
+Only benchmarks whose ``Class.name`` matches the ``pattern`` regular
+expression are run.  ``time_`` benchmarks run in this interpreter,
+``peakmem_`` benchmarks each in a fresh one, whose peak resident
+memory is reported.  To compare a change, run it on both checkouts.
+"""
+from __future__ import print_function
+
+import glob
+import importlib
+import itertools
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+# the checkout, and ``specs``, rather than an installed package
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(DIRECTORY), DIRECTORY]
+
+
+REPEAT = 3
+# seconds a sample of a benchmark without a ``number`` should last
+SAMPLE_TIME = 0.05
+
+
+def discover(directory):
+	"""
+	:returns: ``list`` of the benchmark classes of the ``bench_*``
+		modules in ``directory``, by module and class name.
+	"""
+	classes = []
+	for path in sorted(glob.glob(os.path.join(directory, "bench_*.py"))):
+		module = importlib.import_module(
+			os.path.splitext(os.path.basename(path))[0])
+		for name in sorted(dir(module)):
+			value = getattr(module, name)
+			if isinstance(value, type) and value.__module__ == module.__name__:
+				classes.append(value)
+	return classes
+
+def measure(cls, name, params):
+	"""
+	the best seconds per call of benchmark ``name`` of ``cls`` over
+	``REPEAT`` samples, as asv would: ``setup`` is called before every
+	sample, and a sample is ``cls.number`` calls, or as many as last
+	``SAMPLE_TIME``.
+	"""
+	number = getattr(cls, "number", 0)
+	best = None
+	for sample in range(REPEAT):
+		instance = cls()
+		if hasattr(instance, "setup"):
+			instance.setup(*params)
+		func = getattr(instance, name)
+
+		count = number or 1
+		while True:
+			start = time.time()
+			for call in range(count):
+				func(*params)
+			elapsed = time.time() - start
+			if number or elapsed >= SAMPLE_TIME:
+				break
+			count *= 2
+
+		if hasattr(instance, "teardown"):
+			instance.teardown(*params)
+		if best is None or elapsed / count < best:
+			best = elapsed / count
+	return best
+
+def peakmem(cls, name, index):
+	"""
+	the peak resident bytes of a fresh interpreter calling benchmark
+	``name`` of ``cls`` once, after ``setup``, with the ``index``th
+	combination of its params, as asv would.
+	"""
+	output = subprocess.check_output([
+		sys.executable, os.path.abspath(__file__), "--peakmem",
+		cls.__module__, cls.__name__, name, str(index)])
+	return int(output.split()[-1])
+
+def _peakmem(module, cls, name, index):
+	# the ``peakmem`` child, prints its peak resident bytes
+	cls = getattr(importlib.import_module(module), cls)
+	params = list(itertools.product(*getattr(cls, "params", [])))
+	combination = params[int(index)] if params else ()
+	instance = cls()
+	if hasattr(instance, "setup"):
+		instance.setup(*combination)
+	getattr(instance, name)(*combination)
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes, but bytes on OS X
+	if sys.platform != "darwin":
+		peak *= 1024
+	print(peak)
+
+def main(pattern=None):
+	for cls in discover(DIRECTORY):
+		names = [name for name in sorted(dir(cls))
+				 if name.startswith(("time_", "peakmem_")) and
+				 (pattern is None or
+				  re.search(pattern, "{}.{}".format(cls.__name__, name)))]
+		if not names:
+			continue
+		params = getattr(cls, "params", [])
+		for index, combination in enumerate(itertools.product(*params)):
+			for name in names:
+				if name.startswith("peakmem_"):
+					result = "{:>12.1f} MB".format(
+						peakmem(cls, name, index) / 2.0 ** 20)
+				else:
+					result = "{:>12.3f} ms".format(
+						measure(cls, name, combination) * 1000)
+				print("{:<50} {:<20} {}".format(
+					"{}.{}".format(cls.__name__, name),
+					", ".join(str(param) for param in combination),
+					result))
+
+
+if __name__ == "__main__":
+	if sys.argv[1:2] == ["--peakmem"]:
+		_peakmem(*sys.argv[2:])
+	else:
+		main(sys.argv[1] if len(sys.argv) > 1 else None)
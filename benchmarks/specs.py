@@ -0,0 +1,215 @@
+"""
+Synthetic argspecs, and matching form data, in the shapes the
+benchmarks are run against.
+
+	build("wide", "large")
+
+The ``bench_*`` modules follow asv's conventions, but are run with
+``run.py`` (asv no longer builds Python 2.7 environments):
+
+	python benchmarks/run.py [pattern]
+"""
+import copy
+
+from canonical_args import check
+
+from canonical_args.frontend import sources
+from canonical_args.frontend.profile import synthetic_form as fill
+
+
+class Record(object):
+	"""
+	a row of the in-memory source behind ``cls_spec``.
+	"""
+	def __init__(self, id, name, version):
+		self.id = id
+		self.name = name
+		self.version = version
+
+RECORDS = []
+
+def wide_spec(width):
+	"""
+	a flat spec of ``width`` native args and ``width`` native kwargs.
+	"""
+	types = ["int", "float", "str", "bool"]
+	return {
+		"args": [
+			{
+				"name": "arg{}".format(index),
+				"type": types[index % len(types)],
+				"values": None
+			}
+			for index in range(width)
+		],
+		"kwargs": dict(
+			("kwarg{}".format(index), {
+				"type": types[index % len(types)],
+				"values": None
+			})
+			for index in range(width))
+	}
+
+def deep_spec(depth, width=2):
+	"""
+	a spec of structdicts nested ``depth`` levels deep, each level
+	holding ``width`` native fields.
+	"""
+	def level(remaining):
+		values = {}
+		for index in range(width):
+			values["field{}".format(index)] = {
+				"type": "float",
+				"values": ">=0"
+			}
+		if remaining > 0:
+			values["child"] = {
+				"type": "dict",
+				"values": level(remaining - 1)
+			}
+		return values
+
+	return {
+		"args": [
+			{
+				"name": "arg",
+				"type": "dict",
+				"values": level(depth)
+			}
+		],
+		"kwargs": {}
+	}
+
+def nested_spec(depth, width=3):
+	"""
+	build a spec of nested structdicts ``depth`` levels deep, each
+	level holding ``width`` native fields and a choice of one between
+	an int and the next level.
+	"""
+	def level(remaining):
+		values = {}
+		for index in range(width):
+			values["field{}".format(index)] = {
+				"type": "float",
+				"values": ">=0"
+			}
+		if remaining > 0:
+			values["choice"] = {
+				"type": "one([int, dict])",
+				"values": {
+					"int": None,
+					"dict": level(remaining - 1)
+				}
+			}
+		return values
+
+	return {
+		"args": [
+			{
+				"name": "arg",
+				"type": "dict",
+				"values": level(depth)
+			}
+		],
+		"kwargs": {}
+	}
+
+def unstruct_spec(length):
+	"""
+	a spec of an unstructured list and an unstructured dict, whose
+	forms (see ``fill``) hold ``length`` entries each.
+	"""
+	return {
+		"args": [
+			{
+				"name": "items",
+				"type": "list",
+				"values": None
+			}
+		],
+		"kwargs": {
+			"mapping": {
+				"type": "dict",
+				"values": None
+			}
+		}
+	}
+
+def cls_spec(count):
+	"""
+	a spec of ``cls`` fields backed by an in-memory source of ``count``
+	``Record``s.  (Re-)registers the source.
+	"""
+	RECORDS[:] = [Record(index, "record{}".format(index), index % 7)
+				  for index in range(count)]
+	sources.register(Record,
+					 "id",
+					 ["name", "version"],
+					 "{name} (v{version})",
+					 lambda: RECORDS,
+					 lambda identifier: RECORDS[int(identifier)])
+
+	typestring = "cls('{}')".format(check.type_to_string(Record))
+	return {
+		"args": [
+			{
+				"name": "record",
+				"type": typestring,
+				"values": None
+			},
+			{
+				"name": "records",
+				"type": "structlist([{0}, {0}])".format(typestring),
+				"values": [None, None]
+			}
+		],
+		"kwargs": {}
+	}
+
+# shape name to the spec builder, and its size argument per size name
+SHAPES = {
+	"wide": (wide_spec, {"small": 10, "large": 500}),
+	"deep": (deep_spec, {"small": 5, "large": 100}),
+	"choices": (nested_spec, {"small": 3, "large": 30}),
+	"unstruct": (unstruct_spec, {"small": 10, "large": 2000}),
+	"cls": (cls_spec, {"small": 10, "large": 10000})
+}
+
+SIZES = ["small", "large"]
+
+def _leaves(entry, depth=0):
+	values = entry["values"]
+	if isinstance(values, dict):
+		for key in sorted(values):
+			child = values[key]
+			# choice of one option values are the bare ``values``
+			if isinstance(child, dict) and "type" not in child:
+				child = {"type": key, "values": child}
+			if child is not None:
+				for leaf in _leaves(child, depth + 1):
+					yield leaf
+	elif not isinstance(values, list):
+		yield depth, entry
+
+def edit(spec):
+	"""
+	a copy of ``spec`` with the type of its deepest native arg swapped,
+	as an admin edit of a single field would.
+	"""
+	edited = copy.deepcopy(spec)
+	leaves = [leaf for arg in edited["args"] for leaf in _leaves(arg)]
+	depth, entry = max(leaves, key=lambda leaf: leaf[0])
+	entry["type"] = "NoneType" if entry["type"] != "NoneType" else "int"
+	entry["values"] = None
+	return edited
+
+def build(shape, size):
+	"""
+	:param str shape: one of ``SHAPES``
+	:param str size: one of ``SIZES``
+	:returns: ``tuple`` of the spec and a form for it
+	"""
+	builder, sizes = SHAPES[shape]
+	spec = builder(sizes[size])
+	length = sizes[size] if shape == "unstruct" else 3
+	return spec, fill(spec, length=length)
@@ -0,0 +1,100 @@
+"""
+Check that the specialized reform functions of ``codegen`` agree with
+``format.reform_from_html`` on every benchmark shape, for the
+synthetic form and for mutations of it: missing fields, wrong values,
+wrong types and extra fields and rows.
+
+	python benchmarks/verify_codegen.py [count]
+
+Exits non-zero on the first form they disagree on.  The tests run
+``check`` over fewer forms.
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import warnings
+
+# the checkout, and ``specs``, rather than an installed package
+sys.path[:0] = [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+				os.path.dirname(os.path.abspath(__file__))]
+
+from canonical_args.frontend.html import codegen, compile_spec, format
+
+from specs import SHAPES, SIZES, build
+
+
+VALUES = ["", "1", "x", "1.5", "-3", " 2 ", "True", "False", "None",
+		  u"\xe9"]
+TYPES = ["int", "float", "str", "bool", "NoneType", "long", "list",
+		 "nope"]
+
+
+def mutate(form, rng):
+	"""
+	a copy of the flat ``form`` with random fields dropped, their
+	values or types replaced, and extra fields and rows added.
+	"""
+	form = dict(form)
+	for key in sorted(form):
+		roll = rng.random()
+		if roll < 0.1:
+			del form[key]
+		elif roll < 0.3:
+			value = list(form[key])
+			value[-2] = rng.choice(VALUES)
+			form[key] = value
+		elif roll < 0.4:
+			value = list(form[key])
+			value[-1] = rng.choice(TYPES)
+			form[key] = value
+
+	if form and rng.random() < 0.5:
+		# a field of no arg
+		key = rng.choice(sorted(form))
+		form[key + "-extra"] = [rng.choice(VALUES), rng.choice(TYPES)]
+	for key in sorted(form):
+		match = format.indexed_key.match(key)
+		if match is not None and rng.random() < 0.05:
+			# a row past the submitted ones, of the other unstructured
+			# kind
+			row = "{}[{}]".format(match.group(1), 1000 + rng.randrange(10))
+			if len(form[key]) == 2:
+				form[row] = [rng.choice(["", "k"]), rng.choice(VALUES),
+							 rng.choice(TYPES)]
+			else:
+				form[row] = [rng.choice(VALUES), rng.choice(TYPES)]
+	return form
+
+def check(count=100, seed=0):
+	"""
+	verify ``count`` mutated forms, plus the synthetic form itself, of
+	every shape and size.
+
+	:raises AssertionError: as ``codegen.verify``
+	:returns: ``dict`` of ``(shape, size)`` to the forms checked
+	"""
+	rng = random.Random(seed)
+	checked = {}
+	for shape in sorted(SHAPES):
+		for size in SIZES:
+			spec, form = build(shape, size)
+			compiled = compile_spec(spec)
+			forms = [form] + [mutate(form, rng) for index in range(count)]
+			checked[(shape, size)] = codegen.verify(compiled, forms)
+	return checked
+
+
+if __name__ == "__main__":
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	# unmatched choices warn on every reform
+	warnings.simplefilter("ignore")
+	try:
+		checked = check(count)
+	except AssertionError as e:
+		print(e)
+		sys.exit(1)
+	for shape, size in sorted(checked):
+		print("{:>10} {:>6} {:>6} forms agree".format(
+			shape, size, checked[(shape, size)]))
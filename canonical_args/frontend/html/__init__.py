@@ -4,5 +4,9 @@ in HTML.
 """
 from __future__ import absolute_import
 
-from .format import reform_from_html
-from .generate import generate_html
+from .format import (reform_from_html, reform_from_json, reform_many,
+                     register_caster)
+from .generate import generate_html, generate_html_stream, render_fragment
+from .codegen import compile_reform
+from .plan import compile_spec
+from .wsgi import reform_from_environ
@@ -0,0 +1,99 @@
+"""
+Provide the frontend's scripts and styles as static assets with
+content-hashed filenames, for documents rendered with a
+``static_url`` to reference rather than inline.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+import hashlib
+import pkgutil
+import threading
+
+
+# the vendored jQuery, under ``static/``
+JQUERY = "jquery-3.6.1.min.js"
+
+# the ``macros.html`` macros making up each bundled asset
+BUNDLES = {
+	"argspec.js": ["add_index_js",
+				   "unstruct_js",
+				   "choice_js",
+				   "search_js",
+				   "json_js"],
+	"argspec.css": ["argspec_css"]
+}
+
+CONTENT_TYPES = {
+	".js": "application/javascript; charset=utf-8",
+	".css": "text/css; charset=utf-8"
+}
+
+class Asset(namedtuple("Asset", ["name",
+								 "filename",
+								 "content",
+								 "content_type"])):
+	"""
+	A static asset.
+
+	:ivar str name: the logical name, eg. ``"argspec.js"``
+	:ivar str filename: the name with the content hash, to serve at
+	:ivar str content: the bytes to serve
+	:ivar str content_type: the ``Content-Type`` header value
+	"""
+	__slots__ = ()
+
+# logical name to ``Asset``, built on first use
+_assets = {}
+_lock = threading.Lock()
+
+def _make_asset(name, content):
+	stem, extension = name.rsplit(".", 1)
+	digest = hashlib.sha1(content).hexdigest()[:12]
+	return Asset(name,
+				 "{}.{}.{}".format(stem, digest, extension),
+				 content,
+				 CONTENT_TYPES["." + extension])
+
+def load():
+	"""
+	build every asset, once: the bundles from their ``macros.html``
+	macros, and the vendored jQuery (as ``"jquery.min.js"``).
+
+	:returns: ``dict`` of logical name to ``Asset``
+	"""
+	with _lock:
+		if not _assets:
+			# imported here, generate imports this module
+			from .generate import macros
+
+			markup = macros()
+			for name, parts in BUNDLES.items():
+				content = u"\n".join(unicode(getattr(markup, part)())
+									 for part in parts)
+				_assets[name] = _make_asset(name, content.encode("utf-8"))
+
+			jquery = pkgutil.get_data(__name__.rsplit(".", 1)[0],
+									  "static/" + JQUERY)
+			_assets["jquery.min.js"] = _make_asset("jquery.min.js", jquery)
+	return _assets
+
+def urls(static_url):
+	"""
+	:param str static_url: the url the assets are served under
+	:returns: ``dict`` of logical name to the hashed asset url
+	"""
+	prefix = static_url.rstrip("/")
+	return dict((name, prefix + "/" + asset.filename)
+				for name, asset in load().items())
+
+def find(filename):
+	"""
+	:param str filename: a hashed asset filename
+	:raises KeyError: if there is no such asset.
+	:returns: ``Asset``
+	"""
+	for asset in load().values():
+		if asset.filename == filename:
+			return asset
+	raise KeyError("no static asset '{}'".format(filename))
@@ -0,0 +1,122 @@
+"""
+Provide a bounded cache of rendered form output, keyed by the
+spec fingerprint, the render options and the version of every
+``sources`` entry the spec uses.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+from .. import sources
+
+
+def render_key(compiled, *options):
+	"""
+	build the cache key for rendering ``compiled`` with ``options``.
+
+	:param compiled: the compiled spec
+	:type compiled: ``plan.Plan``
+	:param options: the render options (action, method, etc.)
+	:returns: ``tuple``, hashable and equal for equal output.
+	"""
+	return (compiled.fingerprint, options, source_versions(compiled))
+
+def source_versions(compiled):
+	"""
+	:returns: ``tuple`` of the import string and ``sources.version`` of
+		every source of ``compiled``
+	"""
+	return tuple((import_string, sources.version(import_string))
+				 for import_string in compiled.sources)
+
+
+class RenderCache(object):
+	"""
+	A thread safe LRU mapping of render keys to rendered output.
+
+	:param int maxsize: default 128, the maximum number of rendered
+		documents to keep.
+	"""
+	def __init__(self, maxsize=128):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		"""
+		:returns: the cached output for ``key``, or ``None``
+		"""
+		with self._lock:
+			try:
+				value = self._entries.pop(key)
+			except KeyError:
+				self.misses += 1
+				return None
+			# re-insert as most recently used
+			self._entries[key] = value
+			self.hits += 1
+			return value
+
+	def set(self, key, value):
+		"""
+		store ``value`` under ``key``, evicting the least recently
+		used entries beyond ``maxsize``.
+		"""
+		with self._lock:
+			self._entries.pop(key, None)
+			self._entries[key] = value
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+				self.evictions += 1
+
+	def invalidate(self, fingerprint):
+		"""
+		drop every entry rendered from the spec with ``fingerprint``.
+
+		:param str fingerprint: a ``plan.Plan.fingerprint``
+		:returns: ``int``, the number of entries dropped.
+		"""
+		with self._lock:
+			stale = [key for key in self._entries if key[0] == fingerprint]
+			for key in stale:
+				del self._entries[key]
+			return len(stale)
+
+	def clear(self):
+		"""
+		drop every entry and reset statistics.
+		"""
+		with self._lock:
+			self._entries.clear()
+			self.hits = 0
+			self.misses = 0
+			self.evictions = 0
+
+	def stats(self):
+		"""
+		:returns: ``dict`` of ``hits``, ``misses``, ``evictions``,
+			``size`` and ``maxsize``.
+		"""
+		with self._lock:
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"size": len(self._entries),
+				"maxsize": self.maxsize
+			}
+
+	def __len__(self):
+		return len(self._entries)
+
+
+# the built-in cache, for use with ``generate_html(..., cache=...)``
+default_cache = RenderCache()
+
+# the built-in subtree cache, for use with
+# ``generate_html(..., subtree_cache=...)``
+subtree_cache = RenderCache(maxsize=4096)
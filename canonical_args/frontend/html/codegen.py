@@ -0,0 +1,316 @@
+"""
+Compile an argspec into the python source of a reform function
+specialized to it: field names are constants, casters are bound
+and there is no dispatch on node kinds.  The function is equivalent
+to ``format.reform_from_html`` for the same spec. ::
+
+	reform = codegen.compile_reform(compiled)
+	args = reform(request.form)
+
+Specialized functions are cached per spec fingerprint (and set of
+``format.casters``).
+"""
+from __future__ import absolute_import
+
+import linecache
+import warnings
+
+from .. import instrument
+from . import format, plan
+from .cache import RenderCache
+
+
+class _Writer(object):
+	"""
+	Accumulates the generated source, one function at a time.
+	"""
+	def __init__(self, casters):
+		self.casters = casters
+		# name to value, the globals of the generated module
+		self.namespace = {}
+		self.functions = []
+		# type string to the name its caster is bound to
+		self.bound = {}
+		self._count = 0
+
+	def name(self, prefix):
+		self._count += 1
+		return "{}{}".format(prefix, self._count)
+
+	def bind(self, prefix, value):
+		name = self.name(prefix)
+		self.namespace[name] = value
+		return name
+
+
+def _emit(writer, lines, indent, node):
+	"""
+	append the statements reforming ``node`` to ``lines``.
+
+	:returns: str, the name of the local holding the result
+	"""
+	pad = "    " * indent
+	out = writer.name("v")
+	name = repr(node.name)
+
+	# choice of one, each option in its own function, so that nested
+	# choices do not nest ``try`` blocks
+	if node.kind == plan.ONE:
+		options = [_function(writer, child) for child in node.children]
+		lines.append(pad + "{} = NotSpecified".format(out))
+		lines.append(pad + "for option in ({},):".format(", ".join(options)))
+		lines.append(pad + "    try:")
+		lines.append(pad + "        {} = option(form, indexed)".format(out))
+		lines.append(pad + "    except KeyError:")
+		lines.append(pad + "        pass")
+		lines.append(pad + "    else:")
+		lines.append(pad + "        break")
+		lines.append(pad + "if {} is NotSpecified:".format(out))
+		lines.append(pad + "    _warn({!r}, RuntimeWarning)".format(
+			"could not find valid entry for '{}'".format(node.name)))
+
+	# structlist
+	elif node.kind == plan.STRUCTLIST:
+		entries = [_emit(writer, lines, indent, child)
+				   for child in node.children]
+		lines.append(pad + "{} = [{}]".format(out, ", ".join(
+			"None if {0} is NotSpecified else {0}".format(entry)
+			for entry in entries)))
+
+	# structdict
+	elif node.kind == plan.STRUCTDICT:
+		entries = [(child.key, _emit(writer, lines, indent, child))
+				   for child in node.children]
+		lines.append(pad + "{} = {{{}}}".format(out, ", ".join(
+			"{0!r}: None if {1} is NotSpecified else {1}".format(key, entry)
+			for key, entry in entries)))
+
+	# unstructlist
+	elif node.kind == plan.UNSTRUCTLIST:
+		lines.append(pad + "{} = []".format(out))
+		lines.append(pad + "if not indexed:")
+		lines.append(pad + "    indexed.append(_index_form(form))")
+		lines.append(pad + "for raw in indexed[0].get({}, ()):".format(name))
+		lines.append(pad + "    ret = _cast(raw[0], raw[1], {})".format(name))
+		lines.append(pad + "    if ret is not NotSpecified:")
+		lines.append(pad + "        {}.append(ret)".format(out))
+		lines.append(pad + "if len({0}) == 0:".format(out))
+		lines.append(pad + "    {} = NotSpecified".format(out))
+
+	# unstructdict
+	elif node.kind == plan.UNSTRUCTDICT:
+		lines.append(pad + "{} = {{}}".format(out))
+		lines.append(pad + "if not indexed:")
+		lines.append(pad + "    indexed.append(_index_form(form))")
+		lines.append(pad + "for raw in indexed[0].get({}, ()):".format(name))
+		lines.append(pad + "    if _text(raw[0]) != '':")
+		lines.append(pad + "        ret = _cast(raw[1], raw[2], {})".format(
+			name))
+		lines.append(pad + "        if ret != NotSpecified:")
+		lines.append(pad + "            {}[_text(raw[0])] = ret".format(out))
+		lines.append(pad + "if len({0}) == 0:".format(out))
+		lines.append(pad + "    {} = NotSpecified".format(out))
+
+	# cls
+	elif node.kind == plan.CLS:
+		lines.append(pad + "{0} = ClsReference(form[{1}][1], form[{1}][0])"
+					 .format(out, name))
+
+	# native, selector: the submitted type is cast inline when it is
+	# the spec's, else by ``format.cast``
+	else:
+		raw = writer.name("r")
+		lines.append(pad + "{} = form[{}]".format(raw, name))
+		lines.append(pad + "if {}[1] == {!r}:".format(raw, node.type))
+		lines.extend(pad + "    " + line
+					 for line in _inline_cast(writer, node, raw, out))
+		lines.append(pad + "else:")
+		lines.append(pad + "    {} = _cast({}[0], {}[1], {})".format(
+			out, raw, raw, name))
+
+	return out
+
+def _inline_cast(writer, node, raw, out):
+	"""
+	the statements casting ``raw`` to ``node.type``, as ``format.cast``.
+	"""
+	fallback = "{} = _cast({}[0], {}[1], {!r})".format(out, raw, raw,
+													   node.name)
+	if node.type == "NoneType":
+		return ["_text({}[0])".format(raw),
+				"{} = None".format(out)]
+	if node.type == "bool":
+		return ["{} = _text({}[0]) == 'True'".format(out, raw)]
+	if node.type not in writer.casters:
+		return [fallback]
+
+	value = writer.name("s")
+	if writer.casters[node.type] is str:
+		# ``str`` would fail to encode non-ASCII text
+		return ["{} = _text({}[0])".format(value, raw),
+				"{} = NotSpecified if {} == '' else {}".format(out, value,
+															   value)]
+
+	if node.type not in writer.bound:
+		writer.bound[node.type] = writer.bind("_caster",
+											  writer.casters[node.type])
+	caster = writer.bound[node.type]
+	return ["{} = _text({}[0])".format(value, raw),
+			"if {} == '':".format(value),
+			"    {} = NotSpecified".format(out),
+			"else:",
+			"    try:",
+			"        {} = {}({})".format(out, caster, value),
+			# ``cast`` again, for its error message
+			"    except ValueError:",
+			"        " + fallback]
+
+def _function(writer, node):
+	"""
+	generate a function reforming ``node``.
+
+	:returns: str, the name of the function
+	"""
+	function = writer.name("_option")
+	lines = ["def {}(form, indexed):".format(function)]
+	out = _emit(writer, lines, 1, node)
+	lines.append("    return {}".format(out))
+	writer.functions.append("\n".join(lines))
+	return function
+
+def generate_source(compiled, casters=None):
+	"""
+	generate the source of a reform function for ``compiled``.
+
+	:param compiled: the compiled spec
+	:type compiled: ``plan.Plan``
+	:param dict casters: default ``format.casters``, the casters to
+		bind for the spec's native types
+	:returns: ``tuple`` of the source, and the ``dict`` of the casters
+		it binds, by their names in the source
+	"""
+	writer = _Writer(dict(format.casters if casters is None else casters))
+
+	lines = ["def reform(form, resolve=True):",
+			 "    if _instrument.observer is not None:",
+			 "        # the interpreter reports every node and cast",
+			 "        return _reform_from_html(_plan, form, resolve=resolve)",
+			 "    indexed = []"]
+	args = [_emit(writer, lines, 1, node) for node in compiled.args]
+	kwargs = [(node.key, _emit(writer, lines, 1, node))
+			  for node in compiled.kwargs]
+
+	lines.append("    names = {'args': [], 'kwargs': {}}")
+	for out in args:
+		lines.append("    names['args'].append({0} if {0} != NotSpecified "
+					 "else None)".format(out))
+	for key, out in kwargs:
+		lines.append("    if {} != NotSpecified:".format(out))
+		lines.append("        names['kwargs'][{!r}] = {}".format(key, out))
+	lines.append("    if resolve:")
+	lines.append("        _resolve_references(names)")
+	lines.append("    return names")
+	writer.functions.append("\n".join(lines))
+
+	return "\n\n".join(writer.functions) + "\n", writer.namespace
+
+def build_reform(compiled):
+	"""
+	generate, compile and load the reform function for ``compiled``.
+
+	:returns: callable, ``reform(form, resolve=True)``, with the source
+		it was generated from as its ``source`` attribute.
+	"""
+	source, namespace = generate_source(compiled)
+	filename = "<reform {}>".format(compiled.fingerprint[:12])
+	# so tracebacks show the generated source
+	linecache.cache[filename] = (len(source), None,
+								 source.splitlines(True), filename)
+
+	namespace.update({
+		"NotSpecified": format.NotSpecified,
+		"ClsReference": format.ClsReference,
+		"_cast": format.cast,
+		"_text": format._text,
+		"_index_form": format.index_form,
+		"_resolve_references": format.resolve_references,
+		"_reform_from_html": format.reform_from_html,
+		"_instrument": instrument,
+		"_warn": warnings.warn,
+		"_plan": compiled,
+		# warnings are reported from this module
+		"__name__": __name__
+	})
+	exec compile(source, filename, "exec") in namespace
+
+	reform = namespace["reform"]
+	reform.source = source
+	return reform
+
+# specialized reform functions, by fingerprint and casters
+reformers = RenderCache(maxsize=128)
+
+def compile_reform(spec, delimeter="-"):
+	"""
+	get the reform function specialized to ``spec``, building it on
+	first use.  Registering a caster with ``format.register_caster``
+	builds it again.
+
+	:param spec: the canonical_args argspec dict, or a ``Plan`` from
+		``plan.compile_spec`` (in which case ``delimeter`` is ignored)
+	:type spec: ``dict`` or ``plan.Plan``
+	:param str delimeter: default ``"-"``, as ``reform_from_html``
+	:returns: callable, ``reform(form, resolve=True)``, as
+		``format.reform_from_html(spec, form, resolve=resolve)``
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	key = (compiled.fingerprint, tuple(sorted(format.casters.items())))
+	reform = reformers.get(key)
+	if reform is None:
+		reform = build_reform(compiled)
+		reformers.set(key, reform)
+	return reform
+
+def _outcome(function, *args, **kwargs):
+	try:
+		value = function(*args, **kwargs)
+	except Exception as e:
+		return ("error", type(e), str(e))
+
+	def normalize(value):
+		if isinstance(value, format.ClsReference):
+			return ("cls", value.import_string, value.identifier)
+		if isinstance(value, dict):
+			return dict((key, normalize(item)) for key, item in value.items())
+		if isinstance(value, list):
+			return [normalize(item) for item in value]
+		return value
+	return ("value", normalize(value))
+
+def verify(spec, forms, delimeter="-"):
+	"""
+	reform every one of ``forms`` with both ``format.reform_from_html``
+	and the specialized function, without resolving ``cls``
+	arguments, to check they agree (eg. after registering a caster).
+	``benchmarks/verify_codegen.py``, and ``tests/test_codegen.py``,
+	run it over mutated forms of every benchmark shape.
+
+	:param forms: the flat HTML form data ``dict``s
+	:type forms: iterable
+	:raises AssertionError: on the first form they disagree on, by
+		value or by error.
+	:returns: ``int``, the number of forms checked
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	reform = compile_reform(compiled)
+	count = 0
+	for form in forms:
+		expected = _outcome(format.reform_from_html, compiled, form,
+							resolve=False)
+		actual = _outcome(reform, form, resolve=False)
+		if expected != actual:
+			raise AssertionError(
+				"specialized reform differs for {!r}: expected {!r}, "
+				"got {!r}".format(form, expected, actual))
+		count += 1
+	return count
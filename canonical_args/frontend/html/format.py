@@ -4,10 +4,14 @@ into usable, nested dict of method arguments.
 """
 from __future__ import absolute_import
 
-from canonical_args import check
-from .. import sources
+from .. import instrument, sources
+from . import plan
 
+from collections import namedtuple
+import itertools
+import json
 import re
+import time
 import warnings
 
 
@@ -18,15 +22,145 @@ permitted_types = ["int",
                    "str",
                    "bool"]
 
+# type string to the callable casting a form value to it. "bool" and
+# "NoneType" are handled by ``cast`` itself.
+casters = {
+    "int": int,
+    "float": float,
+    "double": float,
+    "long": long,
+    "str": str
+}
+
+# the JSON types an unstructured value may be submitted as
+json_scalars = (basestring, int, long, float, bool, type(None))
+
+# an unstructured entry key, eg. ``"arg2-subkey1[10]"``
+indexed_key = re.compile(r'^(.*)\[(\d+)\]$')
+
 class NotSpecified(object):
     pass
 
+class Reformed(namedtuple("Reformed", ["index", "value", "error"])):
+    """
+    The outcome of reforming one form of a ``reform_many`` batch.
+
+    :ivar int index: the position of the form in the batch
+    :ivar value: the reconstructed argument ``dict``, or None on error
+    :ivar error: the exception raised reforming the form, or None
+    """
+    __slots__ = ()
+
+class ClsReference(object):
+    """
+    Placeholder for a ``cls`` argument during reformation. Resolved
+    to the real object, in a batch per import string, by
+    ``resolve_references``.
+    """
+    __slots__ = ("import_string", "identifier")
+
+    def __init__(self, import_string, identifier):
+        self.import_string = import_string
+        self.identifier = identifier
+
+def find_references(reformed):
+    """
+    Find every ``ClsReference`` in the nested ``reformed`` structure.
+
+    :param reformed: the nested ``list``/``dict`` structure
+    :returns: ``list`` of ``tuple``s of the containing ``list`` or
+        ``dict``, the key within it, and the ``ClsReference``.
+    """
+    found = []
+
+    def collect(container):
+        if isinstance(container, dict):
+            items = container.items()
+        elif isinstance(container, list):
+            items = enumerate(container)
+        else:
+            return
+        for key, value in items:
+            if isinstance(value, ClsReference):
+                found.append((container, key, value))
+            else:
+                collect(value)
+
+    collect(reformed)
+    return found
+
+def pending_references(reformed):
+    """
+    Group the identifiers of every ``ClsReference`` in ``reformed`` by
+    import string, eg. for a caller to look them up asynchronously.
+
+    :param reformed: the nested ``list``/``dict`` structure, from
+        ``reform_from_html(..., resolve=False)``
+    :returns: ``dict`` of import string to the ``list`` of unique
+        identifiers, in order of appearance.
+    """
+    grouped = {}
+    seen = set()
+    for container, key, reference in find_references(reformed):
+        identifiers = grouped.setdefault(reference.import_string, [])
+        if (reference.import_string, reference.identifier) not in seen:
+            seen.add((reference.import_string, reference.identifier))
+            identifiers.append(reference.identifier)
+    return grouped
+
+def resolve_references(reformed, resolved=None):
+    """
+    Replace every ``ClsReference`` in the nested ``reformed`` structure
+    with its object.
+
+    :param reformed: the nested ``list``/``dict`` structure
+    :param dict resolved: optional, import string to the ``list`` of
+        objects matching ``pending_references(reformed)``.  If not
+        given, one ``sources.get_many`` call is made per import string.
+    :returns: ``reformed``, modified in place.
+    """
+    pending = pending_references(reformed)
+    if resolved is None:
+        resolved = {}
+        for import_string, identifiers in pending.items():
+            resolved[import_string] = sources.get_many(
+                import_string, identifiers, raw=True)
+
+    objects = {}
+    for import_string, identifiers in pending.items():
+        for identifier, obj in zip(identifiers, resolved[import_string]):
+            objects[(import_string, identifier)] = obj
+
+    for container, key, reference in find_references(reformed):
+        container[key] = objects[(reference.import_string,
+                                  reference.identifier)]
+
+    return reformed
+
+def register_caster(typestring, caster):
+    """
+    Permit form values of type ``typestring``, cast with ``caster``.
+    Replaces any caster already registered for ``typestring``. ::
+
+        register_caster("decimal.Decimal", decimal.Decimal)
+
+    :param str typestring: the stringified type, as in the spec
+        (eg. ``check.type_to_string(decimal.Decimal)``)
+    :param callable caster: takes the ``str`` form value, and returns
+        the value, or raises ``ValueError`` if it is invalid.
+    """
+    if typestring in ("bool", "NoneType"):
+        raise ValueError("'{}' cannot be recast".format(typestring))
+    casters[typestring] = caster
+    if typestring not in permitted_types:
+        permitted_types.append(typestring)
+
 def cast(valstring, typestring, name=None):
     """
-    Perform a cast on ``valstring`` to type ``typestring``.
-    First, have to ``eval`` the ``typestring``, provided it
-    is a permitted type (security reasons).
-    :param str valstring: the stringified value
+    Perform a cast on ``valstring`` to type ``typestring``, using
+    the caster registered for it in ``casters``.
+    :param str valstring: the stringified value, ``unicode`` text
+        is kept as it is
     :param str typestring: the stringified type (eg. ``"int"``)
     :param str name: optional, if specified, any errors raised
         are more detailed.
@@ -35,8 +169,23 @@ def cast(valstring, typestring, name=None):
     :raises TypeError: if ``typestring`` is not a permitted type.
     :returns: the ``valstring`` cast to the type of ``typestring``.
     """
-    valstring = str(valstring)
-    typestring = str(typestring)
+    return _cast_text(_text(valstring), str(typestring), name)
+
+def _text(value):
+    # ``str`` where it can be, non-ASCII text stays unicode
+    try:
+        return str(value)
+    except UnicodeEncodeError:
+        return value
+
+def _cast_text(valstring, typestring, name):
+    """
+    ``cast`` an already stringified ``valstring``, which may be
+    ``unicode`` text ``str`` cannot encode.
+    """
+    observer = instrument.observer
+    if observer is not None:
+        observer.cast(typestring, name)
 
     if typestring == "NoneType":
         return None
@@ -49,42 +198,126 @@ def cast(valstring, typestring, name=None):
         # argument was left blank
         return NotSpecified
     else:
-        if typestring not in permitted_types:
+        try:
+            caster = casters[typestring]
+        except KeyError:
             raise TypeError('{} is not a permitted type'.format(typestring))
 
+        if caster is str and isinstance(valstring, unicode):
+            # already text, ``str`` would fail to encode it
+            return valstring
         try:
-            return eval(typestring)(valstring)
+            return caster(valstring)
         except ValueError, e:
+            if isinstance(valstring, unicode):
+                valstring = valstring.encode("utf-8")
             err = "`{}` is invalid for type '{}'".format(valstring, typestring)
             if name:
                 err += " for arg '{}'".format(name)
             raise ValueError(err)
 
-def reform_from_html(spec, form, delimeter="-"):
-
-    def recurse(level, name, types, values, delimeter="-"):
-        """
-        Recurse through a flattened ``form`` dictionary, reconstructing
-        dictionary to match structure specified by ``spec``.
-        :param dict spec: the canonical_args argspec dict
-        :param dict form: the flat HTML form data
-        :param str delimeter: default ``"-"``, the string character used
-            to separate levels in the ``form.keys()`` entries.
-        :returns: ``dict``, the reconstructed, type correct argument
-            dictionary, matching the ``spec`` structure.
-        """
-        subtype = check.eval_subtype(types)
+def cast_json(value, typestring, name=None):
+    """
+    Perform a cast on the JSON ``value`` to type ``typestring``.
+    Strings are cast as by ``cast`` (non-ASCII text is kept as
+    ``unicode``), numbers are accepted by numeric types only if
+    casting does not change them.
+    :param value: the decoded JSON value
+    :param str typestring: the stringified type (eg. ``"int"``)
+    :param str name: optional, as ``cast``
+    :raises ValueError: if ``value`` cannot be cast to requested type
+    :raises TypeError: if ``typestring`` is not a permitted type.
+    :returns: the ``value`` cast to the type of ``typestring``, or
+        ``NotSpecified`` if it is null.
+    """
+    typestring = _text(typestring)
+    if isinstance(value, basestring):
+        return _cast_text(_text(value), typestring, name)
+
+    observer = instrument.observer
+    if observer is not None:
+        observer.cast(typestring, name)
+
+    if typestring == "NoneType":
+        return None
+    if value is None:
+        return NotSpecified
+    if typestring == "bool" and isinstance(value, bool):
+        return value
 
+    err = "`{!r}` is invalid for type '{}'".format(value, typestring)
+    if name:
+        err += " for arg '{}'".format(name)
+
+    if (isinstance(value, (int, long, float)) and
+            not isinstance(value, bool) and
+            typestring in ("int", "long", "float", "double")):
+        ret = casters[typestring](value)
+        if ret == value:
+            return ret
+    raise ValueError(err)
+
+def index_form(form):
+    """
+    Index the unstructured ``name[i]`` entries of a flat ``form`` by
+    base name, in a single pass over its keys.
+
+    :param dict form: the flat HTML form data
+    :returns: ``dict`` mapping each base name to the ``list`` of its
+        form values, ordered by integer index.
+    """
+    index = {}
+    for key in form:
+        if not key.endswith("]"):
+            continue
+        match = indexed_key.match(key)
+        if match is not None:
+            index.setdefault(match.group(1), []).append(
+                (int(match.group(2)), key))
+
+    for base, entries in index.items():
+        entries.sort()
+        index[base] = [form[key] for position, key in entries]
+    return index
+
+def reform_from_html(spec, form, delimeter="-", resolve=True,
+                     specialize=False):
+    """
+    Reconstruct a flattened ``form`` dictionary into the nested argument
+    structure specified by ``spec``.
+
+    :param spec: the canonical_args argspec dict, or a ``Plan`` from
+        ``plan.compile_spec`` or a name registered with ``specs.register``
+        (in which case ``delimeter`` is ignored)
+    :type spec: ``dict``, ``plan.Plan`` or ``str``
+    :param dict form: the flat HTML form data
+    :param str delimeter: default ``"-"``, the string character used
+        to separate levels in the ``form.keys()`` entries.
+    :param bool resolve: default True, look up ``cls`` arguments. when
+        False, they are left as ``ClsReference`` placeholders for the
+        caller to look up (see ``pending_references``) and substitute
+        with ``resolve_references``.
+    :param bool specialize: default False, reform with the function
+        ``codegen.compile_reform`` generates for ``spec``, rather than
+        walking it.  Worth it for specs reformed many times over, best
+        passed as a ``Plan``.
+    :returns: ``dict``, the reconstructed, type correct argument
+        dictionary, matching the ``spec`` structure.
+    """
+    if specialize:
+        # imported here, codegen imports this module
+        from .codegen import compile_reform
+        return compile_reform(spec, delimeter=delimeter)(form,
+                                                         resolve=resolve)
+
+    def visit(node):
         # choice of one
-        if isinstance(subtype, check.ChoiceOfOne):
+        if node.kind == plan.ONE:
             entry = NotSpecified
 
-            for index, subsubtype in enumerate(subtype):
+            for child in node.children:
                 try:
-                    entry = recurse(level+1,
-                                    name,
-                                    subsubtype,
-                                    values[check.type_to_string(subsubtype)])
+                    entry = recurse(child)
                 except KeyError as e:
                     pass
                 else:
@@ -94,19 +327,16 @@ def reform_from_html(spec, form, delimeter="-"):
                 # we couldnt find a valid entry
                 # See? Told you we re-raise the key error.
                 warnings.warn(
-                    "could not find valid entry for '{}'".format(name),
+                    "could not find valid entry for '{}'".format(node.name),
                     RuntimeWarning)
 
             return entry
 
         # structlist
-        elif isinstance(subtype, list) and isinstance(values, list):
+        elif node.kind == plan.STRUCTLIST:
             entry = []
-            for index, subsubtype in enumerate(subtype):
-                ret = recurse(level+1,
-                              name+"[{}]".format(index),
-                              subtype[index],
-                              values[index])
+            for child in node.children:
+                ret = recurse(child)
 
                 if ret is not NotSpecified:
                     # do not append an unspecified value
@@ -119,36 +349,25 @@ def reform_from_html(spec, form, delimeter="-"):
             return entry
 
         # structdict
-        elif subtype == dict and isinstance(values, dict):
+        elif node.kind == plan.STRUCTDICT:
             entry = {}
-            for kw in sorted(values):
-                arg = values[kw]
-                ret = recurse(level+1,
-                              name+delimeter+kw,
-                              arg["type"],
-                              arg["values"],
-                              delimeter=delimeter)
+            for child in node.children:
+                ret = recurse(child)
                 if ret is not NotSpecified:
                     # do not set an unspecified value
-                    entry[kw] = ret
+                    entry[child.key] = ret
                 else:
                     # this is a Structured Dict, so we have to guarantee
                     # the presence of all keys. Thusly, set None when a
                     # value is unspecified.
-                    entry[kw] = None
+                    entry[child.key] = None
             return entry
 
         # unstructlist
-        elif subtype == list and values is None:
-            # find all keys matching (other than index)
-            pattern = re.compile('{}\[(.*)\]'.format(name))
-            matchingkeys = [key for key in form.keys()\
-                            if pattern.match(key)]
-
+        elif node.kind == plan.UNSTRUCTLIST:
+            name = node.name
             construct = []
-            for subkey in sorted(matchingkeys):
-                index = int(re.findall('\[(.*)\]', subkey)[0])
-                raw = form[subkey]
+            for raw in get_index().get(name, ()):
                 ret = cast(raw[0], raw[1], name=name)
                 if ret is not NotSpecified:
                     # ensure not to appaned a NotSpecified value
@@ -161,20 +380,16 @@ def reform_from_html(spec, form, delimeter="-"):
                 return NotSpecified
 
         # unstructdict
-        elif subtype == dict and values is None:
-            pattern = re.compile('{}\[(.*)\]'.format(name))
-            matchingkeys = [key for key in form.keys()\
-                            if pattern.match(key)]
-
+        elif node.kind == plan.UNSTRUCTDICT:
+            name = node.name
             construct = {}
-            for subkey in matchingkeys:
-                raw = form[subkey]
-                if str(raw[0]) != '':
+            for raw in get_index().get(name, ()):
+                if _text(raw[0]) != '':
                     # ensure there is a valid key
                     ret = cast(raw[1], raw[2], name=name)
                     if ret != NotSpecified:
                         # ensure there is a valid value
-                        construct[str(raw[0])] = ret
+                        construct[_text(raw[0])] = ret
                     # this is an unstructured dict, so keys are not
                     # guaranteed here. If a value is unspecified,
                     # simply don't append it (aka, ignore it).
@@ -184,40 +399,317 @@ def reform_from_html(spec, form, delimeter="-"):
                 return NotSpecified
 
         # cls
-        elif check.type_to_string(subtype) in sources.SOURCES:
-            identifier = form[name][0]
-            import_string = form[name][1]
-            obj = sources.get_one(import_string, identifier, raw=True)
-            return obj
+        elif node.kind == plan.CLS:
+            identifier = form[node.name][0]
+            import_string = form[node.name][1]
+            # resolved in batches once the whole form is reformed
+            return ClsReference(import_string, identifier)
 
-        # native
+        # native, selector
         else:
-            raw = form[name]
-            ret = cast(raw[0], raw[1], name=name)
+            raw = form[node.name]
+            ret = cast(raw[0], raw[1], name=node.name)
             return ret
 
+    # built on first use, only forms with unstructured args need it
+    indexed = []
+
+    def get_index():
+        if not indexed:
+            indexed.append(index_form(form))
+        return indexed[0]
+
+    recurse = instrument.node_walker("reform", visit)
+    observer = instrument.observer
+    if observer is not None:
+        start = time.time()
+
+    compiled = plan.get_plan(spec, delimeter=delimeter)
+
     names = {
         "args": [],
         "kwargs": {}
     }
-    for index, arg in enumerate(spec["args"]):
-        ret = recurse(0,
-                      arg["name"],
-                      arg["type"],
-                      arg["values"],
-                      delimeter=delimeter)
+    for node in compiled.args:
+        ret = recurse(node)
         if ret != NotSpecified:
             names["args"].append(ret)
         else:
             names["args"].append(None)
 
-    for kw, arg in spec["kwargs"].items():
-        ret = recurse(0,
-                      kw,
-                      arg["type"],
-                      arg["values"],
-                      delimeter=delimeter)
+    for node in compiled.kwargs:
+        ret = recurse(node)
         if ret != NotSpecified:
-            names["kwargs"][kw] = ret
+            names["kwargs"][node.key] = ret
+
+    if resolve:
+        resolve_references(names)
+
+    if observer is not None:
+        observer.total("reform", time.time() - start)
+    return names
+
+def _reform_chunk(task):
+    """
+    reform a chunk of forms against a compiled spec, without resolving
+    ``cls`` arguments. module level, so process pools can pickle it.
+
+    :returns: ``list`` of ``tuple``s of the value and the error.
+    """
+    spec, forms, specialize = task
+    compiled = plan.get_plan(spec)
+    results = []
+    for form in forms:
+        try:
+            results.append((reform_from_html(compiled, form, resolve=False,
+                                             specialize=specialize),
+                            None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+def _resolve_chunk(results):
+    """
+    resolve the ``cls`` arguments of a whole chunk with one lookup per
+    import string, falling back to each form alone when that fails.
+    """
+    try:
+        resolve_references([value for value, error in results
+                            if error is None])
+    except Exception:
+        for position, (value, error) in enumerate(results):
+            if error is not None:
+                continue
+            try:
+                resolve_references(value)
+            except Exception as e:
+                results[position] = (None, e)
+
+def reform_many(spec, forms, delimeter="-", resolve=True, pool=None,
+                chunksize=100, specialize=False):
+    """
+    Reconstruct many flattened ``forms`` against the same ``spec``,
+    compiling it once. A form which cannot be reformed does not stop
+    the batch, its error is returned in its place.
+
+    :param spec: the canonical_args argspec dict, or a ``Plan`` from
+        ``plan.compile_spec`` (in which case ``delimeter`` is ignored)
+    :type spec: ``dict`` or ``plan.Plan``
+    :param forms: the flat HTML form data ``dict``s
+    :type forms: iterable
+    :param str delimeter: default ``"-"``, as ``reform_from_html``
+    :param bool resolve: default True, as ``reform_from_html``.  Each
+        chunk of forms is resolved with one ``sources.get_many`` call
+        per import string.
+    :param pool: optional, reform the chunks on this pool.  Casters
+        and sources are looked up in the worker processes, so register
+        them before the pool is created.  A chunk the pool fails on
+        (eg. its forms do not pickle) returns the error for each of its
+        forms.
+    :type pool: ``multiprocessing.Pool``
+    :param int chunksize: default 100, the number of forms reformed
+        (and resolved) at once.
+    :param bool specialize: default False, as ``reform_from_html``.
+        Each worker process generates the function for itself.
+    :returns: generator of ``Reformed``, in the order of ``forms``.
+    """
+    compiled = plan.get_plan(spec, delimeter=delimeter)
+    if pool is not None:
+        compiled = plan.portable(compiled)
+    # the number of forms in each chunk, as they are handed out
+    sizes = []
+
+    def chunks():
+        iterator = iter(forms)
+        while True:
+            chunk = list(itertools.islice(iterator, chunksize))
+            if not chunk:
+                return
+            sizes.append(len(chunk))
+            yield compiled, chunk, specialize
+
+    if pool is None:
+        results = itertools.imap(_reform_chunk, chunks())
+    else:
+        results = pool.imap(_reform_chunk, chunks())
+
+    index = 0
+    while True:
+        try:
+            chunk = next(results)
+        except StopIteration:
+            break
+        except Exception as e:
+            # the pool could not reform the chunk at all
+            chunk = [(None, e)] * sizes[index // chunksize]
+        if resolve:
+            _resolve_chunk(chunk)
+        for value, error in chunk:
+            yield Reformed(index, value, error)
+            index += 1
+
+def reform_from_json(spec, payload, delimeter="-", resolve=True):
+    """
+    Reconstruct a nested JSON ``payload``, as submitted by a form
+    generated with ``submit_json=True``, into the argument structure
+    specified by ``spec``.  The payload is already nested like the
+    spec, so values are only cast and checked against it.
+
+    The payload is a ``dict`` of ``"args"``, a ``list``, and
+    ``"kwargs"``, a ``dict``, of:
+
+    - a choice of one: ``{"type": <option>, "value": <value>}``
+    - structured lists and dicts: ``list``/``dict``
+    - unstructured lists: a ``list`` of ``[<value>, <type>]`` rows,
+      each cast to its chosen type as ``reform_from_html`` does (or
+      of bare JSON scalars, kept as they are)
+    - unstructured dicts: a ``dict`` of key to such rows
+    - a cls: the primary identifier, a JSON scalar
+    - anything else: the value, or its string form
+    - an unspecified value: null
+
+    :param spec: the canonical_args argspec dict, or a ``Plan`` from
+        ``plan.compile_spec`` (in which case ``delimeter`` is ignored)
+    :type spec: ``dict`` or ``plan.Plan``
+    :param payload: the JSON document, or it decoded
+    :type payload: ``str`` or ``dict``
+    :param str delimeter: default ``"-"``, as ``reform_from_html``
+    :param bool resolve: default True, as ``reform_from_html``
+    :raises ValueError: if the payload is not a ``dict``, or a value
+        does not match the spec.
+    :returns: ``dict``, the reconstructed, type correct argument
+        dictionary, matching the ``spec`` structure.
+    """
+    if isinstance(payload, basestring):
+        payload = json.loads(payload)
+
+    def expect(value, container, node):
+        if not isinstance(value, container):
+            raise ValueError("expected a {} for arg '{}'".format(
+                container.__name__, node.name))
+
+    def row(item, node):
+        # an unstructured entry, cast to its type as the HTML form's
+        if isinstance(item, list) and len(item) == 2 and \
+                isinstance(item[1], basestring):
+            return cast_json(item[0], item[1], name=node.name)
+        if not isinstance(item, json_scalars):
+            raise ValueError("`{!r}` is invalid for arg '{}'".format(
+                item, node.name))
+        return item
+
+    def visit(value, node):
+        # choice of one
+        if node.kind == plan.ONE:
+            if value is None:
+                warnings.warn(
+                    "could not find valid entry for '{}'".format(node.name),
+                    RuntimeWarning)
+                return NotSpecified
+
+            expect(value, dict, node)
+            for child in node.children:
+                if child.key == value.get("type"):
+                    return recurse(value.get("value"), child)
+            raise ValueError("'{}' is not an option of '{}'".format(
+                value.get("type"), node.name))
+
+        # structlist
+        elif node.kind == plan.STRUCTLIST:
+            if value is None:
+                value = []
+            expect(value, list, node)
+            entry = []
+            for index, child in enumerate(node.children):
+                ret = NotSpecified
+                if index < len(value):
+                    ret = recurse(value[index], child)
+                # positions are guaranteed, unspecified is None
+                entry.append(None if ret is NotSpecified else ret)
+            return entry
+
+        # structdict
+        elif node.kind == plan.STRUCTDICT:
+            if value is None:
+                value = {}
+            expect(value, dict, node)
+            entry = {}
+            for child in node.children:
+                ret = recurse(value.get(child.key), child)
+                # keys are guaranteed, unspecified is None
+                entry[child.key] = None if ret is NotSpecified else ret
+            return entry
+
+        # unstructlist
+        elif node.kind == plan.UNSTRUCTLIST:
+            if value is None:
+                return NotSpecified
+            expect(value, list, node)
+            construct = []
+            for item in value:
+                ret = row(item, node)
+                if ret is not NotSpecified:
+                    construct.append(ret)
+            return construct if len(construct) > 0 else NotSpecified
+
+        # unstructdict
+        elif node.kind == plan.UNSTRUCTDICT:
+            if value is None:
+                return NotSpecified
+            expect(value, dict, node)
+            construct = {}
+            for key, item in value.items():
+                if _text(key) != '':
+                    ret = row(item, node)
+                    if ret is not NotSpecified:
+                        construct[_text(key)] = ret
+            return construct if len(construct) > 0 else NotSpecified
+
+        # cls
+        elif node.kind == plan.CLS:
+            if value is None:
+                return NotSpecified
+            if not isinstance(value, json_scalars):
+                raise ValueError("`{!r}` is not an identifier for arg "
+                                 "'{}'".format(value, node.name))
+            return ClsReference(node.type, value)
+
+        # native, selector
+        else:
+            return cast_json(value, node.type, name=node.name)
+
+    recurse = instrument.node_walker("reform", visit)
+    observer = instrument.observer
+    if observer is not None:
+        start = time.time()
+
+    compiled = plan.get_plan(spec, delimeter=delimeter)
+
+    if not isinstance(payload, dict):
+        raise ValueError("expected a dict of args and kwargs")
+    args = payload.get("args") or []
+    kwargs = payload.get("kwargs") or {}
+    if not isinstance(args, list) or not isinstance(kwargs, dict):
+        raise ValueError("expected a list of args and a dict of kwargs")
+
+    names = {
+        "args": [],
+        "kwargs": {}
+    }
+    for index, node in enumerate(compiled.args):
+        ret = NotSpecified
+        if index < len(args):
+            ret = recurse(args[index], node)
+        names["args"].append(None if ret is NotSpecified else ret)
+
+    for node in compiled.kwargs:
+        ret = recurse(kwargs.get(node.key), node)
+        if ret is not NotSpecified:
+            names["kwargs"][node.key] = ret
+
+    if resolve:
+        resolve_references(names)
 
+    if observer is not None:
+        observer.total("reform", time.time() - start)
     return names
@@ -4,32 +4,328 @@ argspec.
 """
 from __future__ import absolute_import
 
-from jinja2 import Environment, PackageLoader, select_autoescape
-from canonical_args import check
+from collections import namedtuple
+import hashlib
+import json
+import os
+import threading
+import time
+from jinja2 import (BytecodeCache, Environment, FileSystemBytecodeCache,
+					Markup, PackageLoader, select_autoescape)
 
-from .. import sources
+from .. import instrument, sources, specs
+from . import assets, plan
+from .cache import RenderCache, render_key, source_versions
 
 
 
-env = Environment(
-	loader=PackageLoader('canonical_args.frontend.html', 'templates'),
-	autoescape=select_autoescape(['html', 'xml'])
-)
-env.globals.update(zip=zip)
+# the jinja environment, created on first use by ``get_env``
+env = None
+_env_lock = threading.Lock()
+
+# the bytecode cache ``get_env`` creates the environment with
+_bytecode_cache = []
 
 # TODO!
 custom_env = None
 
+# the imported ``macros.html`` module
+_macros = []
+
+# the hash of every template's source, see ``etag``
+_templates_digest = []
+
+def get_env():
+	"""
+	get the jinja environment, creating it on first use so importing
+	this module does not set up the template loader.
+	"""
+	global env
+	if env is None:
+		with _env_lock:
+			if env is None:
+				created = Environment(
+					loader=PackageLoader('canonical_args.frontend.html',
+										 'templates'),
+					autoescape=select_autoescape(['html', 'xml']),
+					extensions=["jinja2.ext.do"],
+					bytecode_cache=(_bytecode_cache[0]
+									if _bytecode_cache else None)
+				)
+				created.globals.update(zip=zip)
+				env = created
+	return env
+
+
+class MemoryBytecodeCache(BytecodeCache):
+	"""
+	A bytecode cache held in process memory, eg. to share compiled
+	templates between environments.
+	"""
+	def __init__(self):
+		self._buckets = {}
+
+	def load_bytecode(self, bucket):
+		code = self._buckets.get(bucket.key)
+		if code is not None:
+			bucket.bytecode_from_string(code)
+
+	def dump_bytecode(self, bucket):
+		self._buckets[bucket.key] = bucket.bytecode_to_string()
+
+	def clear(self):
+		self._buckets.clear()
+
+
+def set_bytecode_cache(cache):
+	"""
+	cache compiled templates, so new environments and processes load
+	them rather than compiling them from source.  Templates already
+	loaded are not recompiled.
+
+	:param cache: a ``jinja2.BytecodeCache`` (eg.
+		``MemoryBytecodeCache()``), a directory for a
+		``jinja2.FileSystemBytecodeCache`` (created if missing), or None
+		for no cache.
+	:type cache: ``jinja2.BytecodeCache`` or ``str``
+	"""
+	if isinstance(cache, basestring):
+		if not os.path.isdir(cache):
+			os.makedirs(cache)
+		cache = FileSystemBytecodeCache(cache)
+	with _env_lock:
+		del _bytecode_cache[:]
+		if cache is not None:
+			_bytecode_cache.append(cache)
+		if env is not None:
+			env.bytecode_cache = cache
+
+def warm_up():
+	"""
+	load and compile every template, and import ``macros.html``.  Call
+	in a pre-forking server's master process, so workers share the
+	compiled templates rather than each compiling them on their first
+	request.
+
+	:returns: ``list`` of the template names loaded.
+	"""
+	loaded = get_env().list_templates(extensions=["html"])
+	for name in loaded:
+		get_env().get_template(name)
+	macros()
+	return loaded
+
+def macros():
+	"""
+	get the ``macros.html`` template module, whose macros hold the
+	markup of every template and can be called directly from python.
+	"""
+	if not _macros:
+		_macros.append(get_env().get_template("macros.html").module)
+	return _macros[0]
+
+class RenderOptions(namedtuple("RenderOptions", ["action",
+												 "method",
+												 "include_styling",
+												 "lazy",
+												 "fragment_url",
+												 "search_url",
+												 "submit_json",
+												 "static_url"])):
+	"""
+	The options a document is rendered with, other than the spec.
+	Hashable, for use in cache keys.  See ``generate_html``.
+	"""
+	__slots__ = ()
+
+# the ``generate_html`` defaults
+default_options = RenderOptions("", "POST", True, False, "", "", False, "")
+
+def templates_digest():
+	"""
+	a hash of the source of every template, computed on first use.
+	"""
+	if not _templates_digest:
+		digest = hashlib.sha1()
+		for name in get_env().list_templates(extensions=["html"]):
+			source = get_env().loader.get_source(get_env(), name)[0]
+			digest.update(name.encode("utf-8"))
+			digest.update(source.encode("utf-8"))
+		_templates_digest.append(digest.hexdigest())
+	return _templates_digest[0]
+
+def versioned(compiled):
+	"""
+	:returns: ``bool``, whether the ``sources.version`` of every source
+		``compiled`` lists options from follows its changes (see
+		``sources.versioned``), so output keyed by the versions may be
+		kept.  Searchable sources list nothing, so always do.
+	"""
+	for import_string in compiled.sources:
+		if not (sources.searchable(import_string) or
+				sources.versioned(import_string)):
+			return False
+	return True
+
+def etag(spec, delimeter="-", **options):
+	"""
+	the entity tag of the document ``generate_html`` renders, without
+	rendering it: a hash of the spec fingerprint, the render options,
+	the ``sources.version`` of every source the spec uses and the
+	templates.  Equal tags mean equal documents, across processes.
+
+	Listed sources whose changes the version does not follow (see
+	``sources.versioned``) leave the document without a tag, as it
+	could change without the tag changing.
+
+	:param spec: as ``generate_html``
+	:param str delimeter: default ``"-"``, as ``generate_html``
+	:param options: the ``generate_html`` keyword arguments, over the
+		options registered with ``spec`` when it is a registered name
+		(see ``specs.register``).  Those not changing the output (eg.
+		``cache`` or ``engine``) are ignored.
+	:returns: str, the quoted tag for an ``ETag`` header, or None
+	"""
+	options = specs.options(spec, options)
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	if not versioned(compiled):
+		return None
+	render_options = default_options._replace(**dict(
+		(field, options[field])
+		for field in RenderOptions._fields if field in options))
+	key = (templates_digest(), render_key(compiled, *render_options))
+	return '"{}"'.format(hashlib.sha1(repr(key)).hexdigest())
+
+# stands in for nested content when splitting wrapper templates
+_marker = u"\x00inner\x00"
+
+def layout_json(compiled):
+	"""
+	the ``plan.layout`` of every argument of ``compiled``, as JSON safe
+	to embed in a ``<script>`` element.
+
+	:returns: ``Markup``
+	"""
+	data = json.dumps({
+		"args": [plan.layout(node) for node in compiled.args],
+		"kwargs": [plan.layout(node) for node in compiled.kwargs]
+	}, sort_keys=True, default=str)
+	return Markup(data.replace("<", "\\u003c")
+					  .replace(">", "\\u003e")
+					  .replace("&", "\\u0026"))
+
+def asset_urls(static_url):
+	"""
+	:returns: ``dict`` of the static asset urls under ``static_url``
+		for the ``form`` and ``styling`` macros, or None to inline the
+		scripts and styles.
+	"""
+	if not static_url:
+		return None
+	return assets.urls(static_url)
+
+def base_context(node, fetched=None):
+	"""
+	build the ``base.html`` render context for a leaf ``node``
+	(unstructured, selector, cls and native kinds).
+
+	:param node: the compiled node
+	:type node: ``plan.Node``
+	:param dict fetched: optional, the ``sources.fetch_all`` results to
+		take ``cls`` options from, rather than calling ``get_all``.
+	:returns: ``dict``
+	"""
+	context = {
+		"name": node.name,
+		"displayname": node.displayname,
+		"type": node.type
+	}
+
+	# unstructlist, unstructdict
+	if node.kind in (plan.UNSTRUCTLIST, plan.UNSTRUCTDICT):
+		context["inputtype"] = node.kind
+
+	# selector
+	elif node.kind == plan.SELECTOR:
+		context["options"] = node.values
+		context["inputtype"] = "selector"
+
+	# cls, too large to list
+	elif node.kind == plan.CLS and sources.searchable(node.type):
+		context["inputtype"] = "search_selector"
+
+	# cls
+	elif node.kind == plan.CLS:
+		if fetched is not None and node.type in fetched:
+			ids, values = fetched[node.type].get()
+		else:
+			ids, values = sources.get_all(node.type)
+		context["option_ids"] = ids
+		context["options"] = values
+		context["inputtype"] = "selector"
+
+	# native
+	else:
+		context["constraint"] = node.values
+		context["inputtype"] = "native"
+
+	return context
+
+def split_template(macro_name, holes=None, **context):
+	"""
+	call the wrapper macro ``macro_name`` with placeholders in place of
+	its nested content, and split the output around them.
+
+	:param str macro_name: the ``macros.html`` macro name
+	:param int holes: default None, a single ``inner`` placeholder.
+		else, the number of ``entries`` placeholders.
+	:returns: ``list`` of strings, one more than the placeholders.
+	"""
+	if holes is None:
+		context["inner"] = _marker
+	else:
+		context["entries"] = [_marker] * holes
+	html = getattr(macros(), macro_name)(**context)
+	return [unicode(part) for part in html.split(_marker)]
+
+# the ``level`` wrapper markup around nested content, by name
+_levels = RenderCache(maxsize=4096)
+
+def level_parts(name):
+	"""
+	the markup before and after the nested content of a ``level``
+	wrapper headed ``name``, as ``split_template``, split once per name.
+
+	:returns: ``list`` of the two strings
+	"""
+	parts = _levels.get(name)
+	if parts is None:
+		parts = split_template("level", name=name, include_header=True)
+		_levels.set(name, parts)
+	return parts
+
 def generate_html(spec,
 				  delimeter="-",
 				  action="",
 				  method="POST",
-				  include_styling=True):
+				  include_styling=True,
+				  cache=None,
+				  engine="nested",
+				  lazy=False,
+				  fragment_url="",
+				  fetched=None,
+				  search_url="",
+				  submit_json=False,
+				  static_url="",
+				  subtree_cache=None):
 	"""
 	Recurse through ``spec`` dict, generating HTML components for
 	argspec entries.
 
-	:param dict spec: the canonical_args argspec dict
+	:param spec: the canonical_args argspec dict, or a ``Plan`` from
+		``plan.compile_spec`` or a name registered with ``specs.register``
+		(in which case ``delimeter`` is ignored)
+	:type spec: ``dict``, ``plan.Plan`` or ``str``
 	:param str delimeter: default ``"-"``, the string character used
 		to separate levels in the HTML input ``"name"`` attributes.
 	:param str action: default ``""``, the html ``<form>`` "action"
@@ -38,161 +334,472 @@ def generate_html(spec,
 		attribute
 	:param bool include_styling: default True, include html ``<style>``
 		tags.
+	:param cache: optional, a ``cache.RenderCache`` (eg.
+		``cache.default_cache``) to look the output up in before
+		rendering, and store it in after.  Most effective when ``spec``
+		is a pre-compiled ``Plan``.  Forms listing sources whose
+		version does not follow their changes (see ``versioned``) are
+		never cached.
+	:param str engine: default ``"nested"``, one of ``ENGINES``.
+		``"nested"`` walks the spec in python calling a macro per node,
+		``"macro"`` renders the document once per plan and options as
+		a skeleton split around its ``cls`` leaves, then only renders
+		those leaves.  Both produce identical output.  A first
+		``"macro"`` render costs about as much as a ``"nested"`` one.
+	:param bool lazy: default False, render only the selector of each
+		choice of one, leaving its options to be fetched from
+		``fragment_url`` when picked.
+	:param str fragment_url: the url the frontend requests lazy choices
+		from, with ``field`` and ``option`` query arguments.  The view
+		should answer with ``render_fragment``.
+	:param dict fetched: optional, import string to ``tuple`` of the ids
+		and display names ``sources.get_all`` would return, for every
+		source in ``plan.Plan.sources``.  Lets callers fetch sources
+		themselves (eg. awaiting them in an event loop), leaving
+		rendering free of I/O.
+	:param str search_url: the url search selectors (``cls`` sources
+		registered with a ``search`` method) request pages from, with
+		``source``, ``q``, ``offset`` and ``limit`` query arguments.
+		The view should answer with ``views.search_view``.
+	:param bool submit_json: default False, submit the arguments as a
+		single ``json`` form field, already nested like the argspec,
+		rather than one flattened field per input.  Reform it with
+		``format.reform_from_json``.
+	:param str static_url: the url ``views.static_view`` serves the
+		static assets under.  When given, the document references the
+		(content-hashed, cacheable) scripts, styles and a bundled jQuery
+		there, rather than inlining them and loading jQuery remotely.
+	:param subtree_cache: optional, a ``cache.RenderCache`` (eg.
+		``cache.subtree_cache``) to memoize the HTML of every subtree
+		in, keyed by its ``plan.Node.digest``.  After a spec is edited
+		only the changed subtrees, and the wrappers of their ancestors,
+		are rendered again.  ``"nested"`` engine only.
 	:returns: str, the fully rendered HTML to display on the front end.
 	"""
+	if engine not in ENGINES:
+		raise ValueError("unknown engine '{}', expected one of {}".format(
+			engine, sorted(ENGINES)))
+	if subtree_cache is not None and engine != "nested":
+		raise ValueError("subtree_cache requires the 'nested' engine")
 
-	def recurse(level, name, types, values, delimeter=delimeter):
-		subtype = check.eval_subtype(types)
+	observer = instrument.observer
+	if observer is not None:
+		start = time.time()
 
-		# choice of one
-		if isinstance(subtype, check.ChoiceOfOne):
-			entries = []
-			for index, subsubtype in enumerate(subtype):
-				entries.append(recurse(level+1,
-									   name,
-									   subtype[index],
-									   values[check.type_to_string(subsubtype)]
-									   ))
-
-			template = env.get_template("one_selector.html")
-			html = template.render(name=name,
-								   options=[check.type_to_string(x)\
-								   			for x in subtype],
-								   entries=entries)
-			
-			if level > 0:
-				template = env.get_template("level.html")
-				html = template.render(name=name.split(delimeter)[-1],
-									   include_header=True,
-									   inner=html)
-			return html			
-
-
-		# structlist
-		elif isinstance(subtype, list) and isinstance(values, list):
-			# recurse
-			html = ""
-			for index, subsubtype in enumerate(subtype):
-				html += recurse(level+1,
-								name+"["+str(index)+"]",
-								subtype[index],
-								values[index])
-
-			if level > 0:
-				template = env.get_template("level.html")
-				html = template.render(name=name.split(delimeter)[-1],
-									   include_header=True,
-									   inner=html)
-			return html
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	options = RenderOptions(action,
+							method,
+							include_styling,
+							lazy,
+							fragment_url,
+							search_url,
+							submit_json,
+							static_url)
 
-		# structdict
-		elif subtype == dict and isinstance(values, dict):
-			html = ""
-			for kw in sorted(values):
-				arg = values[kw]
-				html += recurse(level+1,
-								name+delimeter+kw,
-								arg["type"],
-								arg["values"])
-
-			if level > 0:
-				template = env.get_template("level.html")
-				html = template.render(name=name.split(delimeter)[-1],
-									   include_header=True,
-									   inner=html)
-			return html
+	# output listing unversioned sources could go stale unseen
+	if not versioned(compiled):
+		cache = subtree_cache = None
 
-		# unstructlist
-		elif subtype == list and values is None:
-			template = env.get_template("base.html")
-			html = template.render(name=name,
-								   displayname=name.split(delimeter)[-1],
-								   type=check.type_to_string(subtype),
-								   inputtype="unstructlist")
-
-			if level > 0:
-				template = env.get_template("level.html")
-				html = template.render(name=name.split(delimeter)[-1],
-									   include_header=True,
-									   inner=html)
+	if cache is not None:
+		key = render_key(compiled, *options)
+		html = cache.get(key)
+		if html is not None:
 			return html
 
+	fetched = prepare_fetched(compiled, fetched)
+	if subtree_cache is not None:
+		html = render_nested(compiled, options, fetched, subtree_cache)
+	else:
+		html = ENGINES[engine](compiled, options, fetched)
 
-		# unstructdict
-		elif subtype == dict and values is None:
-			template = env.get_template("base.html")
-			html = template.render(name=name,
-								   displayname=name.split(delimeter)[-1],
-								   type=check.type_to_string(subtype),
-								   inputtype="unstructdict")
+	# a source which fell back to no options would be cached as empty
+	if cache is not None and not fell_back(fetched):
+		cache.set(key, html)
 
-			if level > 0:
-				template = env.get_template("level.html")
-				html = template.render(name=name.split(delimeter)[-1],
-									   include_header=True,
-									   inner=html)
-			return html
+	if observer is not None:
+		observer.total("render", time.time() - start)
+	return html
+
+def prepare_fetched(compiled, fetched=None):
+	"""
+	get the ``sources.Fetch`` for every source of ``compiled``, wrapping
+	the caller's own ``fetched`` results, or else starting them all
+	concurrently with ``sources.fetch_all``.  The renderers wait on each
+	as they reach its first ``cls`` leaf.
 
-		# selector
-		elif isinstance(values, list):
-			template = env.get_template("base.html")
-			return template.render(name=name,
-								   displayname=name.split(delimeter)[-1],
-								   type=check.type_to_string(subtype),
-								   options=values,
-								   inputtype="selector")
-
-		# cls
-		elif check.type_to_string(subtype) in sources.SOURCES:
-			ids, values = sources.get_all(subtype)
-
-			template = env.get_template("base.html")
-			return template.render(name=name,
-								   displayname=name.split(delimeter)[-1],
-								   type=check.type_to_string(subtype),
-								   option_ids=ids,
-								   options=values,
-								   inputtype="selector")
-
-		# native
+	:param dict fetched: optional, as ``generate_html``, or already
+		``sources.Fetch`` values, which are kept.
+	:returns: ``dict`` of import string to ``sources.Fetch``
+	"""
+	if fetched is None:
+		return sources.fetch_all([import_string
+								  for import_string in compiled.sources
+								  if not sources.searchable(import_string)])
+	return dict((import_string,
+				 value if isinstance(value, sources.Fetch)
+				 else sources.Fetch(import_string, value=value))
+				for import_string, value in fetched.items())
+
+def fell_back(fetched):
+	"""
+	:param dict fetched: the ``prepare_fetched`` results, or None
+	:returns: ``bool``, whether any source in ``fetched`` failed and
+		was rendered without options (see ``sources.Fetch.failed``).
+	"""
+	return fetched is not None and any(fetch.failed
+									   for fetch in fetched.values())
+
+def render_node(level, node, lazy=False, fetched=None, subtree_cache=None,
+				versions=()):
+	"""
+	render a single compiled ``node`` (and its children), as
+	``node_parts``.
+
+	:returns: ``Markup``
+	"""
+	return Markup(u"".join(node_parts(level, node, lazy, fetched,
+									  subtree_cache, versions)))
+
+def node_parts(level, node, lazy=False, fetched=None, subtree_cache=None,
+			   versions=(), slots=None):
+	"""
+	render a single compiled ``node`` (and its children) by walking it
+	in python, calling the ``macros.html`` macro for each leaf and
+	splitting each wrapper around its nested content (see
+	``split_template``).  The HTML is kept as a list of fragments, so
+	nested content is copied once, when the document is joined, rather
+	than once per level it is nested in.
+
+	:param int level: the depth of ``node``, nodes below the top level
+		are wrapped in ``level.html``
+	:param node: the compiled node
+	:type node: ``plan.Node``
+	:param bool lazy: default False, leave choice of one options empty
+	:param dict fetched: optional, as ``base_context``
+	:param subtree_cache: optional, a ``cache.RenderCache`` to look
+		every subtree's fragments up in before rendering it, and store
+		them in after.
+	:type subtree_cache: ``cache.RenderCache``
+	:param tuple versions: the ``cache.source_versions`` of the plan,
+		for subtree cache keys
+	:param list slots: optional, leave a ``_marker`` in place of every
+		``cls`` leaf, appending the leaf to ``slots``.
+	:returns: ``list`` (or cached ``tuple``) of HTML fragments
+	"""
+	markup = macros()
+
+	def wrap(level, node, parts):
+		if level > 0:
+			head, tail = level_parts(node.displayname)
+			return [head] + parts + [tail]
+		return parts
+
+	def visit(level, node):
+		if subtree_cache is None:
+			return render(level, node)
+
+		# the level only decides whether the node is wrapped
+		key = (node.digest, level > 0, lazy, versions)
+		parts = subtree_cache.get(key)
+		if parts is None:
+			parts = tuple(render(level, node))
+			if not fell_back(fetched):
+				subtree_cache.set(key, parts)
+		return parts
+
+	def render(level, node):
+		# choice of one
+		if node.kind == plan.ONE:
+			options = [child.key for child in node.children]
+			if lazy:
+				parts = [markup.one_selector(node.name,
+											 options,
+											 [u""] * len(node.children),
+											 True)]
+			else:
+				split = split_template("one_selector",
+									   holes=len(node.children),
+									   name=node.name,
+									   options=options,
+									   lazy=False)
+				parts = [split[0]]
+				for child, part in zip(node.children, split[1:]):
+					parts.extend(recurse(level+1, child))
+					parts.append(part)
+			return wrap(level, node, parts)
+
+		# structlist, structdict
+		elif node.kind in (plan.STRUCTLIST, plan.STRUCTDICT):
+			parts = []
+			for child in node.children:
+				parts.extend(recurse(level+1, child))
+			return wrap(level, node, parts)
+
+		# unstructlist, unstructdict
+		elif node.kind in (plan.UNSTRUCTLIST, plan.UNSTRUCTDICT):
+			parts = [markup.base(**base_context(node, fetched))]
+			return wrap(level, node, parts)
+
+		# selector, cls, native
 		else:
-			# name, type, inputtype
-			template = env.get_template("base.html")
-			return template.render(name=name,
-								   displayname=name.split(delimeter)[-1],
-								   type=check.type_to_string(subtype),
-								   constraint=values,
-								   inputtype="native")
-
-	html = ""
-	for index, arg in enumerate(spec["args"]):
-		subhtml = recurse(0,
-						  arg["name"],
-						  arg["type"],
-						  arg["values"])
-		# level template
-		template = env.get_template("level.html")
-		html += template.render(name=arg["name"],
-								include_header=True,
-								inner=subhtml)
-
-	for kw, arg in spec["kwargs"].items():
-		subhtml = recurse(0,
-						  kw,
-						  arg["type"],
-						  arg["values"])
-		# level template
-		template = env.get_template("level.html")
-		html += template.render(name=kw,
-								include_header=True,
-								inner=subhtml)
-
-	# top template
-	template = env.get_template("form.html")
-	html = template.render(inner=html, action=action, method=method)
+			if slots is not None and node.kind == plan.CLS:
+				slots.append(node)
+				return [_marker]
+			return [markup.base(**base_context(node, fetched))]
+
+	recurse = instrument.node_walker("render", visit)
+	return recurse(level, node)
+
+def render_nested(compiled, options, fetched=None, subtree_cache=None):
+	"""
+	render ``compiled`` with ``node_parts``, joining the document once.
+
+	:param compiled: the compiled spec
+	:type compiled: ``plan.Plan``
+	:param RenderOptions options: the render options
+	:param dict fetched: optional, as ``base_context``
+	:param subtree_cache: optional, as ``node_parts``
+	:type subtree_cache: ``cache.RenderCache``
+	:returns: str, the fully rendered HTML.
+	"""
+	return u"".join(document_parts(compiled, options, fetched,
+								   subtree_cache))
+
+def document_parts(compiled, options, fetched=None, subtree_cache=None,
+				   slots=None):
+	"""
+	the fragments of the whole document of ``compiled``, the
+	``node_parts`` of every top level node inside the ``form`` and
+	``styling`` wrappers.
+
+	:param slots: optional, as ``node_parts``
+	:returns: ``list`` of HTML fragments
+	"""
+	versions = source_versions(compiled) if subtree_cache is not None else ()
+	assets = asset_urls(options.static_url)
+
+	parts = []
+	if options.include_styling:
+		styling_head, styling_tail = split_template("styling", assets=assets)
+		parts.append(styling_head)
+
+	form_head, form_tail = split_template(
+		"form",
+		action=options.action,
+		method=options.method,
+		fragment_url=options.fragment_url,
+		search_url=options.search_url,
+		layout=layout_json(compiled) if options.submit_json else u"",
+		assets=assets)
+	parts.append(form_head)
+
+	for node in compiled.args + compiled.kwargs:
+		head, tail = level_parts(node.key)
+		parts.append(head)
+		parts.extend(node_parts(0,
+								node,
+								lazy=options.lazy,
+								fetched=fetched,
+								subtree_cache=subtree_cache,
+								versions=versions,
+								slots=slots))
+		parts.append(tail)
+
+	parts.append(form_tail)
+	if options.include_styling:
+		parts.append(styling_tail)
+	return parts
+
+def render_macro(compiled, options, fetched=None):
+	"""
+	render ``compiled`` from its skeleton: the document rendered once,
+	split around the ``cls`` leaves.  The skeleton is kept in
+	``skeletons`` so later renders of the same plan only render their
+	``cls`` leaves, whose options come from ``sources``.
+
+	:param compiled: the compiled spec
+	:type compiled: ``plan.Plan``
+	:param RenderOptions options: the render options
+	:param dict fetched: optional, as ``base_context``
+	:returns: str, the fully rendered HTML.
+	"""
+	key = (compiled.fingerprint, options)
+	skeleton = skeletons.get(key)
+	if skeleton is None:
+		skeleton = render_skeleton(compiled, options)
+		skeletons.set(key, skeleton)
+
+	segments, slots = skeleton
+	markup = macros()
+
+	def fill(node):
+		return markup.base(**base_context(node, fetched))
+	fill = instrument.node_walker("render", fill)
+
+	html = [segments[0]]
+	for node, segment in zip(slots, segments[1:]):
+		html.append(fill(node))
+		html.append(segment)
+	return u"".join(html)
+
+def render_skeleton(compiled, options):
+	"""
+	render ``compiled`` with ``document_parts``, leaving a slot for
+	every ``cls`` leaf.
+
+	:returns: ``tuple`` of the ``list`` of static segments, and the
+		``list`` of ``cls`` nodes filling the slots between them.
+	"""
+	slots = []
+	html = u"".join(document_parts(compiled, options, slots=slots))
+	return html.split(_marker), slots
+
+# rendered skeletons for the ``"macro"`` engine
+skeletons = RenderCache(maxsize=256)
+
+ENGINES = {
+	"nested": render_nested,
+	"macro": render_macro
+}
+
+def find_choice(compiled, field_path):
+	"""
+	find the choice of one node named ``field_path`` in ``compiled``.
+
+	:raises KeyError: if there is no such choice.
+	:returns: ``plan.Node``
+	"""
+	for top in compiled.args + compiled.kwargs:
+		for node in plan.iter_nodes(top):
+			if node.kind == plan.ONE and node.name == field_path:
+				return node
+	raise KeyError("no choice of one named '{}'".format(field_path))
+
+def render_fragment(spec, field_path, option, delimeter="-"):
+	"""
+	Render the HTML of a single option of a lazily rendered choice of
+	one, as requested by the frontend from ``fragment_url``.  Choices
+	nested inside the option are lazy too.
+
+	:param spec: the canonical_args argspec dict, or a ``Plan``
+	:type spec: ``dict`` or ``plan.Plan``
+	:param str field_path: the field name of the choice (the ``field``
+		query argument)
+	:param str option: the chosen type string (the ``option`` query
+		argument)
+	:param str delimeter: default ``"-"``, as ``generate_html``
+	:raises KeyError: if there is no such choice, or option.
+	:returns: str, the HTML to place inside the option's container.
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	choice = find_choice(compiled, field_path)
+	for child in choice.children:
+		if child.key == option:
+			# options are always nested below their choice
+			return unicode(render_node(1, child, lazy=True))
+	raise KeyError("'{}' is not an option of '{}'".format(option, field_path))
+
+def generate_html_stream(spec,
+						 delimeter="-",
+						 action="",
+						 method="POST",
+						 include_styling=True,
+						 lazy=False,
+						 fragment_url="",
+						 fetched=None,
+						 search_url="",
+						 submit_json=False,
+						 static_url=""):
+	"""
+	Generate the same document as ``generate_html``, as a generator of
+	HTML chunks in document order, so a response can start streaming
+	before the whole form is rendered.  Leaves are rendered with
+	``Template.generate``, wrappers are emitted as the markup before
+	and after their nested content.
+
+	Parameters are as ``generate_html``.
+
+	:returns: generator of ``str``, which joined equal the output of
+		``generate_html``.
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	fetched = prepare_fetched(compiled, fetched)
+
+	def wrapped(name, chunks):
+		head, tail = level_parts(name)
+		yield head
+		for chunk in chunks:
+			yield chunk
+		yield tail
+
+	def stream(level, node):
+		# choice of one
+		if node.kind == plan.ONE:
+			chunks = stream_choice(level, node)
+
+		# structlist, structdict
+		elif node.kind in (plan.STRUCTLIST, plan.STRUCTDICT):
+			chunks = stream_children(level, node)
+
+		# unstructlist, unstructdict
+		elif node.kind in (plan.UNSTRUCTLIST, plan.UNSTRUCTDICT):
+			template = get_env().get_template("base.html")
+			chunks = template.generate(**base_context(node, fetched))
+
+		# selector, cls, native
+		else:
+			template = get_env().get_template("base.html")
+			return template.generate(**base_context(node, fetched))
+
+		if level > 0:
+			return wrapped(node.displayname, chunks)
+		return chunks
+
+	def stream_choice(level, node):
+		if lazy:
+			yield unicode(macros().one_selector(
+				node.name,
+				[child.key for child in node.children],
+				[u""] * len(node.children),
+				True))
+			return
+
+		parts = split_template("one_selector",
+							   holes=len(node.children),
+							   name=node.name,
+							   options=[child.key for child in node.children],
+							   lazy=False)
+		for part, child in zip(parts, node.children):
+			yield part
+			for chunk in stream(level+1, child):
+				yield chunk
+		yield parts[-1]
+
+	def stream_children(level, node):
+		for child in node.children:
+			for chunk in stream(level+1, child):
+				yield chunk
 
 	if include_styling:
-		template = env.get_template("styling.html")
-		html = template.render(inner=html)
+		styling_head, styling_tail = split_template(
+			"styling", assets=asset_urls(static_url))
+		yield styling_head
 
-	return html
+	form_head, form_tail = split_template("form",
+										  action=action,
+										  method=method,
+										  fragment_url=fragment_url,
+										  search_url=search_url,
+										  layout=(layout_json(compiled)
+												  if submit_json else u""),
+										  assets=asset_urls(static_url))
+	yield form_head
+
+	for node in compiled.args + compiled.kwargs:
+		for chunk in wrapped(node.key, stream(0, node)):
+			yield chunk
+
+	yield form_tail
+
+	if include_styling:
+		yield styling_tail
@@ -0,0 +1,287 @@
+"""
+Compile a canonical_args argspec into an immutable tree of
+nodes, resolving every ``type`` string once.  The resulting
+plan can be handed to both ``generate.generate_html`` and
+``format.reform_from_html`` in place of the raw spec dict.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+from canonical_args import check
+
+import hashlib
+import json
+import time
+
+from .. import instrument, sources
+
+
+# node kinds
+ONE = "one"
+STRUCTLIST = "structlist"
+STRUCTDICT = "structdict"
+UNSTRUCTLIST = "unstructlist"
+UNSTRUCTDICT = "unstructdict"
+SELECTOR = "selector"
+CLS = "cls"
+NATIVE = "native"
+
+
+class Node(namedtuple("Node", ["kind",
+							   "name",
+							   "key",
+							   "displayname",
+							   "type",
+							   "subtype",
+							   "values",
+							   "children",
+							   "digest"])):
+	"""
+	A single compiled argspec entry.
+
+	:ivar str kind: one of the module level kind constants
+	:ivar str name: the full HTML field name, eg. ``"arg2-subkey1"``
+	:ivar key: the key of this node within its parent (the keyword
+		for structdict entries, the index for structlist entries,
+		the type string for choice of one options)
+	:ivar str displayname: the last component of ``name``
+	:ivar str type: the resolved type string, eg. ``"int"``
+	:ivar subtype: the evaluated type
+	:ivar values: the ``"values"`` constraint for native nodes, the
+		``tuple`` of options for selector nodes, else ``None``
+	:ivar tuple children: compiled sub nodes
+	:ivar str digest: a stable hash of the node's structure (kind,
+		name, key, type and values) and its children's digests, equal
+		for equal subtrees at the same field path
+	"""
+	__slots__ = ()
+
+
+class Plan(namedtuple("Plan", ["args",
+							   "kwargs",
+							   "delimeter",
+							   "sources",
+							   "fingerprint"])):
+	"""
+	A compiled argspec.
+
+	:ivar tuple args: a ``Node`` per positional arg
+	:ivar tuple kwargs: a ``Node`` per keyword arg, in
+		``spec["kwargs"].items()`` order
+	:ivar str delimeter: the delimeter used to build field names
+	:ivar tuple sources: sorted import strings of every ``cls``
+		source the spec refers to
+	:ivar str fingerprint: a stable hash of the compiled structure,
+		equal for equal specs (across processes)
+	"""
+	__slots__ = ()
+
+
+def compile_node(name, key, types, values, delimeter="-"):
+	"""
+	Compile a single argspec entry (and its children).
+
+	:param str name: the full field name of the entry
+	:param key: the key of the entry within its parent
+	:param types: the entry ``"type"``
+	:param values: the entry ``"values"``
+	:param str delimeter: default ``"-"``, the string used to separate
+		levels in the field names.
+	:returns: ``Node``
+	"""
+	subtype = check.eval_subtype(types)
+	typestring = check.type_to_string(subtype)
+	displayname = name.split(delimeter)[-1]
+	children = ()
+	constraint = None
+
+	# choice of one
+	if isinstance(subtype, check.ChoiceOfOne):
+		kind = ONE
+		children = tuple(
+			compile_node(name,
+						 check.type_to_string(subsubtype),
+						 subsubtype,
+						 values[check.type_to_string(subsubtype)],
+						 delimeter=delimeter)
+			for subsubtype in subtype)
+
+	# structlist
+	elif isinstance(subtype, list) and isinstance(values, list):
+		kind = STRUCTLIST
+		children = tuple(
+			compile_node(name+"["+str(index)+"]",
+						 index,
+						 subtype[index],
+						 values[index],
+						 delimeter=delimeter)
+			for index in range(len(subtype)))
+
+	# structdict
+	elif subtype == dict and isinstance(values, dict):
+		kind = STRUCTDICT
+		children = tuple(
+			compile_node(name+delimeter+kw,
+						 kw,
+						 values[kw]["type"],
+						 values[kw]["values"],
+						 delimeter=delimeter)
+			for kw in sorted(values))
+
+	# unstructlist
+	elif subtype == list and values is None:
+		kind = UNSTRUCTLIST
+
+	# unstructdict
+	elif subtype == dict and values is None:
+		kind = UNSTRUCTDICT
+
+	# selector
+	elif isinstance(values, list):
+		kind = SELECTOR
+		constraint = tuple(values)
+
+	# cls
+	elif typestring in sources.SOURCES:
+		kind = CLS
+
+	# native
+	else:
+		kind = NATIVE
+		constraint = values
+
+	# repr rather than ``fingerprint``, this runs for every node
+	digest = hashlib.sha1(repr((kind,
+								name,
+								key,
+								typestring,
+								constraint,
+								tuple(child.digest for child in children)))
+						  ).hexdigest()
+
+	return Node(kind, name, key, displayname, typestring, subtype,
+				constraint, children, digest)
+
+def iter_nodes(node):
+	"""
+	depth first iteration over ``node`` and all of its children.
+	"""
+	yield node
+	for child in node.children:
+		for sub in iter_nodes(child):
+			yield sub
+
+def describe(node):
+	"""
+	a JSON serializable description of ``node`` and its children,
+	used to build fingerprints.
+	"""
+	return [node.kind,
+			node.name,
+			node.key,
+			node.type,
+			node.values,
+			[describe(child) for child in node.children]]
+
+def layout(node):
+	"""
+	a JSON serializable outline of ``node`` and its children, for the
+	frontend to build nested submissions with.
+
+	:returns: ``dict`` of the ``kind``, ``name``, ``key``, ``type``
+		and ``children`` of the node.
+	"""
+	return {
+		"kind": node.kind,
+		"name": node.name,
+		"key": node.key,
+		"type": node.type,
+		"children": [layout(child) for child in node.children]
+	}
+
+def fingerprint(description):
+	"""
+	a stable hash of a JSON serializable description, eg. a
+	``describe`` output.
+	"""
+	data = json.dumps(description, sort_keys=True, default=repr)
+	return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def compile_spec(spec, delimeter="-"):
+	"""
+	Compile ``spec`` into an immutable ``Plan``.  All ``type``
+	evaluation, type string conversion and ``sources`` lookups happen
+	here, once, rather than on every render or reform.
+
+	:param dict spec: the canonical_args argspec dict
+	:param str delimeter: default ``"-"``, the string character used
+		to separate levels in the HTML input ``"name"`` attributes.
+	:returns: ``Plan``
+
+	.. note :: ``cls`` types are resolved against the ``sources``
+		registered at compile time.  Register sources before
+		compiling.
+	"""
+	start = time.time()
+	args = tuple(compile_node(arg["name"],
+							  arg["name"],
+							  arg["type"],
+							  arg["values"],
+							  delimeter=delimeter)
+				 for arg in spec["args"])
+	kwargs = tuple(compile_node(kw,
+								kw,
+								arg["type"],
+								arg["values"],
+								delimeter=delimeter)
+				   for kw, arg in spec.get("kwargs", {}).items())
+
+	found = set()
+	for top in args + kwargs:
+		for node in iter_nodes(top):
+			if node.kind == CLS:
+				found.add(node.type)
+
+	digest = fingerprint([delimeter,
+						  [node.digest for node in args],
+						  [node.digest for node in kwargs]])
+
+	observer = instrument.observer
+	if observer is not None:
+		observer.compile(digest, time.time() - start)
+
+	return Plan(args, kwargs, delimeter, tuple(sorted(found)), digest)
+
+def _strip(node):
+	return node._replace(subtype=None,
+						 children=tuple(_strip(child)
+										for child in node.children))
+
+def portable(compiled):
+	"""
+	a copy of ``compiled`` without the evaluated ``Node.subtype``s,
+	which need not pickle (eg. ``NoneType``), to send to process pools.
+	Renders and reforms as ``compiled`` does.
+
+	:returns: ``Plan``
+	"""
+	return compiled._replace(args=tuple(_strip(node) for node in compiled.args),
+							 kwargs=tuple(_strip(node)
+										  for node in compiled.kwargs))
+
+def get_plan(spec, delimeter="-"):
+	"""
+	return ``spec`` if it is already a ``Plan``, the compiled spec
+	registered under it if it is a name (see ``specs.register``), else
+	compile it.
+
+	.. note :: when ``spec`` is a ``Plan`` or a name, ``delimeter`` is
+		ignored in favour of the plan's own.
+	"""
+	if isinstance(spec, Plan):
+		return spec
+	if isinstance(spec, basestring):
+		# imported here, specs imports this module
+		from .. import specs
+		return specs.get(spec)
+	return compile_spec(spec, delimeter=delimeter)
@@ -0,0 +1,158 @@
+"""
+Provide framework agnostic helpers for the views serving the
+generated frontend, and those it calls back into.
+"""
+from __future__ import absolute_import
+
+import json
+
+from .. import sources, specs
+from . import assets, generate, plan
+
+
+# the largest page a search selector may request
+MAX_SEARCH_LIMIT = 100
+
+def search_view(args):
+	"""
+	Answer a search selector page request, as sent to the
+	``search_url`` given to ``generate.generate_html``. ::
+
+		@app.route("/search")
+		def search():
+			return views.search_view(request.args), 200, \
+				{"Content-Type": "application/json"}
+
+	:param args: the request query arguments: ``source`` (the import
+		string), ``q``, and optionally ``offset`` and ``limit``.
+	:type args: ``dict``-like
+	:raises KeyError: if ``source`` is missing or not registered.
+	:raises ValueError: if the source is not searchable, or ``offset``
+		or ``limit`` are not integers.
+	:returns: str, the JSON page: the ``ids`` and display ``names`` of
+		the matches, and whether there are ``more``.
+	"""
+	import_string = args["source"]
+	query = args.get("q", "")
+	offset = max(0, int(args.get("offset", 0)))
+	limit = min(max(1, int(args.get("limit", 20))), MAX_SEARCH_LIMIT)
+
+	# ask for one extra match to tell if there is another page
+	ids, names = sources.search(import_string, query, offset, limit + 1)
+	return json.dumps({
+		"ids": ids[:limit],
+		"names": names[:limit],
+		"more": len(ids) > limit
+	}, default=str)
+
+# a year, the hashed filenames change with the content
+STATIC_MAX_AGE = 31536000
+
+def static_view(filename):
+	"""
+	Serve a static asset, as referenced by documents rendered with a
+	``static_url`` given to ``generate.generate_html``. ::
+
+		@app.route("/static/argspec/<filename>")
+		def static(filename):
+			try:
+				content, headers = views.static_view(filename)
+			except KeyError:
+				abort(404)
+			return content, 200, headers
+
+	:param str filename: the hashed asset filename
+	:raises KeyError: if there is no such asset.
+	:returns: ``tuple`` of the content and a ``dict`` of headers
+	"""
+	asset = assets.find(filename)
+	return asset.content, {
+		"Content-Type": asset.content_type,
+		"Cache-Control": "public, max-age={}, immutable".format(
+			STATIC_MAX_AGE)
+	}
+
+def _matches(if_none_match, tag):
+	"""
+	whether the ``If-None-Match`` header value matches ``tag``, by weak
+	comparison.
+	"""
+	if if_none_match.strip() == "*":
+		return True
+	for candidate in if_none_match.split(","):
+		candidate = candidate.strip()
+		if candidate.startswith("W/"):
+			candidate = candidate[2:]
+		if candidate == tag:
+			return True
+	return False
+
+def form_view(spec, if_none_match=None, **options):
+	"""
+	Answer a request for the form of ``spec``, rendering it only when
+	the client's cached copy (``if_none_match``) is stale. ::
+
+		@app.route("/")
+		def index():
+			html, headers = views.form_view(
+				"myform", request.headers.get("If-None-Match"), lazy=True)
+			if html is None:
+				return "", 304, headers
+			return html, 200, headers
+
+	:param spec: as ``generate.generate_html``, best a registered name
+		or a ``Plan``, which are not compiled again.
+	:param str if_none_match: optional, the ``If-None-Match`` request
+		header
+	:param options: the ``generate.generate_html`` keyword arguments,
+		over the options registered with ``spec`` when it is a
+		registered name (see ``specs.register``)
+	:returns: ``tuple`` of the HTML, or None when the client's copy is
+		current (answer 304), and a ``dict`` of headers.  Forms without
+		a ``generate.etag`` are always rendered, and sent without one.
+	"""
+	options = specs.options(spec, options)
+	delimeter = options.pop("delimeter", "-")
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	tag = generate.etag(compiled, **options)
+	headers = {
+		# cached, but revalidated on every use
+		"Cache-Control": "no-cache"
+	}
+	if tag is not None:
+		headers["ETag"] = tag
+		if if_none_match and _matches(if_none_match, tag):
+			return None, headers
+
+	# prepared here to see whether any source fell back to no options
+	fetched = generate.prepare_fetched(compiled, options.pop("fetched", None))
+	html = generate.generate_html(compiled, fetched=fetched, **options)
+	if generate.fell_back(fetched):
+		# a form missing options must not be revalidated as current
+		headers.pop("ETag", None)
+		headers["Cache-Control"] = "no-store"
+
+	headers["Content-Type"] = "text/html; charset=utf-8"
+	return html, headers
+
+def form_app(spec, **options):
+	"""
+	A WSGI application serving the form of ``spec``, as ``form_view``. ::
+
+		application = views.form_app("myform", lazy=True)
+
+	:returns: callable, the WSGI application
+	"""
+	def application(environ, start_response):
+		html, headers = form_view(spec,
+								  environ.get("HTTP_IF_NONE_MATCH"),
+								  **options)
+		if html is None:
+			start_response("304 Not Modified", list(headers.items()))
+			return []
+
+		body = html.encode("utf-8")
+		headers["Content-Length"] = str(len(body))
+		start_response("200 OK", list(headers.items()))
+		return [body]
+	return application
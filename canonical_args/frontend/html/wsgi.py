@@ -0,0 +1,297 @@
+"""
+Reform a form submission straight from a WSGI request body, parsing
+it incrementally rather than through the framework's form parsing. ::
+
+	@app.route("/", methods=["POST"])
+	def submit():
+		args = wsgi.reform_from_environ(compiled, request.environ)
+
+Only the fields of the spec are kept: every other field, and every
+file upload, is skipped as it is read, and the unstructured rows,
+fields and value sizes kept are capped.
+"""
+from __future__ import absolute_import
+
+import cgi
+import urllib
+
+from . import format, plan
+
+
+# defaults for the ``reform_from_environ`` caps
+MAX_ROWS = 1000
+MAX_FIELDS = 10000
+MAX_VALUE = 65536
+
+# the most bytes of headers a multipart part may have
+MAX_HEADERS = 8192
+
+CHUNK_SIZE = 65536
+
+
+class _Fields(object):
+	"""
+	Collects the fields of ``compiled`` into a flat form, as
+	``reform_from_html`` takes, enforcing the caps.
+	"""
+	def __init__(self, compiled, max_rows, max_fields):
+		self.max_rows = max_rows
+		self.max_fields = max_fields
+		self.form = {}
+		# unstructured base name to its number of rows
+		self.rows = {}
+		self.count = 0
+
+		self.leaves = set()
+		self.unstructured = set()
+		for top in compiled.args + compiled.kwargs:
+			for node in plan.iter_nodes(top):
+				if node.kind in (plan.UNSTRUCTLIST, plan.UNSTRUCTDICT):
+					self.unstructured.add(node.name)
+				elif node.kind in (plan.NATIVE, plan.SELECTOR, plan.CLS):
+					self.leaves.add(node.name)
+
+	def _base(self, name):
+		if not name.endswith("]"):
+			return None
+		match = format.indexed_key.match(name)
+		if match is None or match.group(1) not in self.unstructured:
+			return None
+		return match.group(1)
+
+	def accepts(self, name):
+		return name in self.leaves or self._base(name) is not None
+
+	def add(self, name, value):
+		self.count += 1
+		if self.count > self.max_fields:
+			raise ValueError("more than {} fields submitted".format(
+				self.max_fields))
+
+		values = self.form.get(name)
+		if values is None:
+			base = self._base(name)
+			if base is not None:
+				rows = self.rows.get(base, 0) + 1
+				if rows > self.max_rows:
+					raise ValueError("more than {} rows submitted for "
+									 "arg '{}'".format(self.max_rows, base))
+				self.rows[base] = rows
+			values = self.form[name] = []
+		values.append(value)
+
+
+def _chunks(stream, length, chunk_size):
+	"""
+	read ``length`` bytes of ``stream``, or all of it if None.
+	"""
+	while length is None or length > 0:
+		size = chunk_size if length is None else min(chunk_size, length)
+		chunk = stream.read(size)
+		if not chunk:
+			return
+		if length is not None:
+			length -= len(chunk)
+		yield chunk
+
+def _decode(data, charset):
+	return data.decode(charset, "replace")
+
+def _read_urlencoded(chunks, fields, charset, max_value):
+	"""
+	add the ``application/x-www-form-urlencoded`` pairs of ``chunks``
+	to ``fields``.
+	"""
+	buffer = ""
+	skipping = False
+	for chunk in chunks:
+		if skipping:
+			# the rest of a pair ``fields`` does not accept
+			end = chunk.find("&")
+			if end < 0:
+				continue
+			chunk = chunk[end + 1:]
+			skipping = False
+
+		pairs = (buffer + chunk).split("&")
+		buffer = pairs.pop()
+		for pair in pairs:
+			_add_pair(pair, fields, charset, max_value)
+
+		# decide on a partial pair as soon as its name is complete
+		equals = buffer.find("=")
+		if equals >= 0 and not fields.accepts(
+				_decode(urllib.unquote_plus(buffer[:equals]), charset)):
+			buffer = ""
+			skipping = True
+		# percent encoding triples a value at most
+		elif len(buffer) > 3 * max_value + MAX_HEADERS:
+			raise ValueError("a value of more than {} bytes was "
+							 "submitted".format(max_value))
+
+	if buffer and not skipping:
+		_add_pair(buffer, fields, charset, max_value)
+
+def _add_pair(pair, fields, charset, max_value):
+	if not pair:
+		return
+	name, equals, value = pair.partition("=")
+	name = _decode(urllib.unquote_plus(name), charset)
+	if not fields.accepts(name):
+		return
+	value = urllib.unquote_plus(value)
+	if len(value) > max_value:
+		raise ValueError("a value of more than {} bytes was submitted for "
+						 "arg '{}'".format(max_value, name))
+	fields.add(name, _decode(value, charset))
+
+def _read_multipart(chunks, fields, boundary, charset, max_value):
+	"""
+	add the ``multipart/form-data`` fields of ``chunks`` to ``fields``,
+	skipping file uploads.
+	"""
+	delimiter = "\r\n--" + boundary
+	# the first delimiter has no preceding line break
+	buffer = "\r\n"
+	state = "preamble"
+	name = None
+	value = []
+	size = 0
+
+	for chunk in chunks:
+		buffer += chunk
+		while True:
+			if state in ("preamble", "body"):
+				at = buffer.find(delimiter)
+				end = at if at >= 0 else len(buffer) - len(delimiter) + 1
+				if end > 0 and state == "body" and name is not None:
+					size += end
+					if size > max_value:
+						raise ValueError(
+							"a value of more than {} bytes was submitted "
+							"for arg '{}'".format(max_value, name))
+					value.append(buffer[:end])
+				if at < 0:
+					# keep what may be the start of a delimiter
+					buffer = buffer[max(end, 0):]
+					break
+				if state == "body" and name is not None:
+					fields.add(name, _decode("".join(value), charset))
+				buffer = buffer[at + len(delimiter):]
+				state = "boundary"
+
+			if state == "boundary":
+				if buffer.startswith("--"):
+					return
+				line = buffer.find("\r\n")
+				if line < 0:
+					if len(buffer) > MAX_HEADERS:
+						raise ValueError("malformed multipart boundary")
+					break
+				buffer = buffer[line + 2:]
+				state = "headers"
+
+			if state == "headers":
+				if buffer.startswith("\r\n"):
+					headers, buffer = "", buffer[2:]
+				else:
+					end = buffer.find("\r\n\r\n")
+					if end < 0:
+						if len(buffer) > MAX_HEADERS:
+							raise ValueError("multipart headers of more than "
+											 "{} bytes".format(MAX_HEADERS))
+						break
+					headers, buffer = buffer[:end], buffer[end + 4:]
+
+				name = None
+				for header in headers.split("\r\n"):
+					key, colon, header = header.partition(":")
+					if key.strip().lower() != "content-disposition":
+						continue
+					disposition, params = cgi.parse_header(header)
+					if "name" in params and "filename" not in params:
+						name = _decode(params["name"], charset)
+				if name is not None and not fields.accepts(name):
+					name = None
+				value = []
+				size = 0
+				state = "body"
+
+	if state != "boundary":
+		raise ValueError("truncated multipart body")
+
+def read_form(spec, environ, delimeter="-", max_rows=MAX_ROWS,
+			  max_fields=MAX_FIELDS, max_value=MAX_VALUE,
+			  chunk_size=CHUNK_SIZE):
+	"""
+	Read the flat form data of the fields of ``spec`` from the body of
+	the WSGI request ``environ``, incrementally.
+
+	:param spec: the canonical_args argspec dict, or a ``Plan`` from
+		``plan.compile_spec`` (in which case ``delimeter`` is ignored)
+	:type spec: ``dict`` or ``plan.Plan``
+	:param dict environ: the WSGI environ, its ``wsgi.input`` unread
+	:param str delimeter: default ``"-"``, as ``reform_from_html``
+	:param int max_rows: default ``MAX_ROWS``, the most rows of any one
+		unstructured list or dict
+	:param int max_fields: default ``MAX_FIELDS``, the most values
+		kept in all
+	:param int max_value: default ``MAX_VALUE``, the most bytes of any
+		one value
+	:param int chunk_size: default ``CHUNK_SIZE``, the bytes read at
+		once
+	:raises ValueError: if the body is not form data, is malformed, or
+		exceeds a cap.
+	:returns: ``dict`` of field name to the ``list`` of its values, as
+		``reform_from_html`` takes.
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	fields = _Fields(compiled, max_rows, max_fields)
+
+	content_type, params = cgi.parse_header(environ.get("CONTENT_TYPE", ""))
+	charset = params.get("charset", "utf-8")
+	try:
+		length = int(environ.get("CONTENT_LENGTH") or 0)
+	except ValueError:
+		raise ValueError("invalid CONTENT_LENGTH")
+	if not environ.get("CONTENT_LENGTH") and \
+			environ.get("wsgi.input_terminated"):
+		# chunked, read to the end of the input
+		length = None
+
+	chunks = _chunks(environ["wsgi.input"], length, chunk_size)
+	if content_type == "application/x-www-form-urlencoded":
+		_read_urlencoded(chunks, fields, charset, max_value)
+	elif content_type == "multipart/form-data":
+		if not params.get("boundary"):
+			raise ValueError("multipart/form-data without a boundary")
+		_read_multipart(chunks, fields, params["boundary"], charset,
+						max_value)
+	else:
+		raise ValueError("unsupported content type '{}'".format(
+			content_type))
+	return fields.form
+
+def reform_from_environ(spec, environ, delimeter="-", resolve=True,
+						specialize=False, **caps):
+	"""
+	Reconstruct the form submitted in the body of the WSGI request
+	``environ`` into the nested argument structure specified by
+	``spec``, reading only the spec's fields (see ``read_form``).
+
+	:param spec: the canonical_args argspec dict, or a ``Plan`` from
+		``plan.compile_spec`` (in which case ``delimeter`` is ignored)
+	:type spec: ``dict`` or ``plan.Plan``
+	:param dict environ: the WSGI environ, its ``wsgi.input`` unread
+	:param str delimeter: default ``"-"``, as ``reform_from_html``
+	:param bool resolve: default True, as ``reform_from_html``
+	:param bool specialize: default False, as ``reform_from_html``
+	:param caps: optional, the ``max_rows``, ``max_fields``,
+		``max_value`` and ``chunk_size`` of ``read_form``
+	:raises ValueError: as ``read_form``
+	:returns: ``dict``, as ``reform_from_html``
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	form = read_form(compiled, environ, **caps)
+	return format.reform_from_html(compiled, form, resolve=resolve,
+								   specialize=specialize)
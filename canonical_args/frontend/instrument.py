@@ -0,0 +1,282 @@
+"""
+Provide observer hooks into rendering, reformation and ``sources``
+lookups, for finding where the time of a slow form goes.
+
+	aggregator = instrument.Aggregator()
+	with instrument.observing(aggregator):
+		generate.generate_html(spec)
+	aggregator.report()
+
+No observer is set by default, and the hooks then cost one attribute
+lookup per call.
+"""
+from __future__ import absolute_import
+
+from contextlib import contextmanager
+import functools
+import sys
+import threading
+import time
+import types
+
+from canonical_args import check
+
+
+# the current observer, or None. see ``set_observer``
+observer = None
+
+
+class Observer(object):
+	"""
+	The observer interface.  Every method is a no-op, subclass and
+	override the ones of interest.  Methods may be called from
+	several threads (eg. ``sources.fetch_all`` workers) at once.
+	"""
+	def node(self, phase, kind, path, seconds):
+		"""
+		a single node was rendered or reformed.
+
+		:param str phase: ``"render"`` or ``"reform"``
+		:param str kind: the ``plan`` node kind (eg. ``plan.NATIVE``)
+		:param str path: the field name of the node
+		:param float seconds: the time spent on the node itself,
+			excluding its children.
+		"""
+
+	def total(self, phase, seconds):
+		"""
+		a whole document was rendered (``generate_html``) or a whole
+		form reformed (``reform_from_html``, ``reform_from_json``).
+		"""
+
+	def compile(self, fingerprint, seconds):
+		"""
+		a spec was compiled (type evaluation included).
+		"""
+
+	def fetch(self, import_string, operation, seconds):
+		"""
+		a ``sources`` lookup returned.
+
+		:param str operation: the ``sources`` function, eg.
+			``"get_all"``
+		"""
+
+	def cast(self, typestring, path):
+		"""
+		a form value was cast to ``typestring``.
+		"""
+
+
+def set_observer(new):
+	"""
+	:param new: the observer to call, or None to stop observing.
+	:type new: ``Observer``
+	:returns: the previous observer, or None.
+	"""
+	global observer
+	previous = observer
+	observer = new
+	return previous
+
+@contextmanager
+def observing(new):
+	"""
+	observe with ``new`` for the duration of a ``with`` block.
+	"""
+	previous = set_observer(new)
+	try:
+		yield new
+	finally:
+		set_observer(previous)
+
+
+class NodeTimer(object):
+	"""
+	Times the nodes of a depth first walk, reporting each node's own
+	time to ``observer``.  Call ``enter`` before visiting a node and
+	``exit`` after.
+	"""
+	def __init__(self, observer, phase):
+		self.observer = observer
+		self.phase = phase
+		self._stack = []
+
+	def enter(self):
+		# start time, and time spent in children so far
+		self._stack.append([time.time(), 0.0])
+
+	def exit(self, node):
+		start, children = self._stack.pop()
+		elapsed = time.time() - start
+		if self._stack:
+			self._stack[-1][1] += elapsed
+		self.observer.node(self.phase, node.kind, node.name,
+						   elapsed - children)
+
+def node_walker(phase, visit):
+	"""
+	wrap the recursive ``visit(..., node)`` so that the current
+	observer times every node, or return it as is when there is none.
+	"""
+	if observer is None:
+		return visit
+	timer = NodeTimer(observer, phase)
+
+	def timed(*args):
+		timer.enter()
+		try:
+			return visit(*args)
+		finally:
+			timer.exit(args[-1])
+	return timed
+
+def fetch_timer(operation):
+	"""
+	decorate a ``sources`` lookup taking the import string first, to
+	report its latency to the current observer.
+	"""
+	def decorate(func):
+		@functools.wraps(func)
+		def wrapper(import_string, *args, **kwargs):
+			current = observer
+			if current is None:
+				return func(import_string, *args, **kwargs)
+			start = time.time()
+			try:
+				return func(import_string, *args, **kwargs)
+			finally:
+				if isinstance(import_string, types.TypeType):
+					import_string = check.type_to_string(import_string)
+				current.fetch(import_string, operation, time.time() - start)
+		return wrapper
+	return decorate
+
+
+class Aggregator(Observer):
+	"""
+	An observer summing counts and times, for printing the hottest
+	fields with ``report``.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		"""
+		drop everything aggregated so far.
+		"""
+		with self._lock:
+			# (phase, path, kind) to [count, seconds]
+			self.nodes = {}
+			# (phase, kind) to [count, seconds]
+			self.kinds = {}
+			# phase to [count, seconds]
+			self.totals = {}
+			# [count, seconds]
+			self.compiles = [0, 0.0]
+			# (import_string, operation) to [count, seconds, slowest]
+			self.fetches = {}
+			# typestring to count
+			self.casts = {}
+
+	def node(self, phase, kind, path, seconds):
+		with self._lock:
+			entry = self.nodes.setdefault((phase, path, kind), [0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+			entry = self.kinds.setdefault((phase, kind), [0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+
+	def total(self, phase, seconds):
+		with self._lock:
+			entry = self.totals.setdefault(phase, [0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+
+	def compile(self, fingerprint, seconds):
+		with self._lock:
+			self.compiles[0] += 1
+			self.compiles[1] += seconds
+
+	def fetch(self, import_string, operation, seconds):
+		with self._lock:
+			entry = self.fetches.setdefault((import_string, operation),
+											[0, 0.0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+			entry[2] = max(entry[2], seconds)
+
+	def cast(self, typestring, path):
+		with self._lock:
+			self.casts[typestring] = self.casts.get(typestring, 0) + 1
+
+	def hottest(self, limit=10, phase=None):
+		"""
+		:param int limit: default 10, the number of fields
+		:param str phase: optional, only ``"render"`` or ``"reform"``
+		:returns: ``list`` of ``tuple``s of phase, path, kind, count and
+			seconds, the fields with the most time first.
+		"""
+		with self._lock:
+			rows = [key + (count, seconds)
+					for key, (count, seconds) in self.nodes.items()
+					if phase is None or key[0] == phase]
+		rows.sort(key=lambda row: row[4], reverse=True)
+		return rows[:limit]
+
+	def report(self, limit=10, out=None):
+		"""
+		print the totals, the time per node kind, source latencies,
+		cast counts and the ``limit`` hottest fields.
+
+		:param out: default ``sys.stdout``, a file like object
+		"""
+		out = out or sys.stdout
+		write = lambda line="": out.write(line + "\n")
+
+		with self._lock:
+			totals = sorted(self.totals.items())
+			kinds = sorted(self.kinds.items(),
+						   key=lambda item: item[1][1], reverse=True)
+			fetches = sorted(self.fetches.items(),
+							 key=lambda item: item[1][1], reverse=True)
+			casts = sorted(self.casts.items())
+			compiles = list(self.compiles)
+
+		write("{:<10} {:>8} {:>12}".format("phase", "count", "total (ms)"))
+		for phase, (count, seconds) in totals:
+			write("{:<10} {:>8} {:>12.3f}".format(phase, count, seconds * 1000))
+		write("{:<10} {:>8} {:>12.3f}".format("compile", compiles[0],
+											  compiles[1] * 1000))
+
+		write()
+		write("{:<10} {:<14} {:>8} {:>12}".format(
+			"phase", "kind", "count", "total (ms)"))
+		for (phase, kind), (count, seconds) in kinds:
+			write("{:<10} {:<14} {:>8} {:>12.3f}".format(
+				phase, kind, count, seconds * 1000))
+
+		if fetches:
+			write()
+			write("{:<40} {:<10} {:>8} {:>12} {:>12}".format(
+				"source", "operation", "count", "total (ms)", "max (ms)"))
+			for (import_string, operation), (count, seconds, slowest) \
+					in fetches:
+				write("{:<40} {:<10} {:>8} {:>12.3f} {:>12.3f}".format(
+					import_string, operation, count,
+					seconds * 1000, slowest * 1000))
+
+		if casts:
+			write()
+			write("{:<20} {:>8}".format("cast", "count"))
+			for typestring, count in casts:
+				write("{:<20} {:>8}".format(typestring, count))
+
+		write()
+		write("{:<10} {:<40} {:<14} {:>8} {:>12}".format(
+			"phase", "field", "kind", "count", "total (ms)"))
+		for phase, path, kind, count, seconds in self.hottest(limit):
+			write("{:<10} {:<40} {:<14} {:>8} {:>12.3f}".format(
+				phase, path, kind, count, seconds * 1000))
@@ -0,0 +1,258 @@
+"""
+Profile generating and reforming the HTML frontend of an argspec,
+with form data synthesized from the spec itself.
+
+	python -m canonical_args.frontend.profile spec.json
+	python -m canonical_args.frontend.profile myapp/specs.py --attr argspec
+	python -m canonical_args.frontend.profile myapp.specs:argspec -n 500
+
+Python modules are imported before profiling, so they may register
+the ``sources`` their ``cls`` arguments use.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import cProfile
+import imp
+import importlib
+import json
+import os
+import pstats
+import signal
+import time
+
+from . import instrument, sources
+from .html import codegen, format, generate, plan
+
+
+# sample form values per native type
+_samples = {
+	"int": "1",
+	"long": "1",
+	"float": "1.5",
+	"double": "1.5",
+	"str": "x",
+	"bool": "True",
+	"NoneType": "None"
+}
+
+def synthetic_form(spec, length=3, delimeter="-"):
+	"""
+	build the flat form data a browser would submit for ``spec``,
+	picking the first option of every choice of one.
+
+	:param spec: the canonical_args argspec dict, or a ``Plan``
+	:type spec: ``dict`` or ``plan.Plan``
+	:param int length: default 3, the number of entries in every
+		unstructured list and dict.
+	:param str delimeter: default ``"-"``, as ``generate_html``
+	:returns: ``dict``
+	"""
+	compiled = plan.get_plan(spec, delimeter=delimeter)
+	form = {}
+
+	def recurse(node):
+		if node.kind == plan.ONE:
+			# options share the choice's name, reform takes the first
+			recurse(node.children[0])
+
+		elif node.kind in (plan.STRUCTLIST, plan.STRUCTDICT):
+			for child in node.children:
+				recurse(child)
+
+		elif node.kind == plan.UNSTRUCTLIST:
+			for index in range(length):
+				form["{}[{}]".format(node.name, index)] = [str(index), "int"]
+
+		elif node.kind == plan.UNSTRUCTDICT:
+			for index in range(length):
+				form["{}[{}]".format(node.name, index)] = [
+					"key{}".format(index), str(index), "int"]
+
+		elif node.kind == plan.CLS:
+			ids, names = sources.get_all(node.type)
+			identifier = ids[0] if ids else ""
+			form[node.name] = [str(identifier), node.type]
+
+		elif node.kind == plan.SELECTOR:
+			form[node.name] = [str(node.values[0]), node.type]
+
+		else:
+			form[node.name] = [_samples.get(node.type, "x"), node.type]
+
+	for node in compiled.args + compiled.kwargs:
+		recurse(node)
+	return form
+
+def load_spec(target, attr="argspec"):
+	"""
+	load an argspec from a ``.json`` file, a ``.py`` file, or an
+	importable module, optionally suffixed ``:attribute``.
+
+	:param str attr: default ``"argspec"``, the module attribute
+		holding the spec, unless given in ``target``.
+	:returns: ``dict``
+	"""
+	if target.endswith(".json"):
+		with open(target) as handle:
+			return json.load(handle)
+
+	if ":" in target:
+		target, attr = target.rsplit(":", 1)
+
+	if target.endswith(".py"):
+		name = os.path.splitext(os.path.basename(target))[0]
+		module = imp.load_source(name, target)
+	else:
+		module = importlib.import_module(target)
+	return getattr(module, attr)
+
+
+class StackSampler(object):
+	"""
+	Sample the call stack on a CPU time interval, counting collapsed
+	stacks (``outer;inner count`` lines) for flame graph tools.  Unix
+	only, it uses ``signal.ITIMER_PROF``.
+
+	:param float interval: default 0.001, seconds between samples
+	"""
+	def __init__(self, interval=0.001):
+		self.interval = interval
+		self.stacks = {}
+
+	def _sample(self, signum, frame):
+		names = []
+		while frame is not None:
+			code = frame.f_code
+			names.append("{} ({}:{})".format(
+				code.co_name,
+				os.path.basename(code.co_filename),
+				code.co_firstlineno))
+			frame = frame.f_back
+		stack = ";".join(reversed(names))
+		self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+	def start(self):
+		signal.signal(signal.SIGPROF, self._sample)
+		signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+	def stop(self):
+		signal.setitimer(signal.ITIMER_PROF, 0, 0)
+		signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+	def dump(self, path):
+		with open(path, "w") as handle:
+			for stack, count in sorted(self.stacks.items()):
+				handle.write("{} {}\n".format(stack, count))
+
+
+def run(spec, number=100, length=3, engine="nested", compiled=False,
+		specialize=False):
+	"""
+	generate and reform ``spec`` ``number`` times each.
+
+	:param bool compiled: default False, compile ``spec`` once up
+		front rather than on every call.
+	:param bool specialize: default False, reform with the function
+		``codegen.compile_reform`` generates.
+	:returns: ``dict`` of phase to the mean seconds per call.
+	"""
+	if compiled:
+		spec = plan.compile_spec(spec)
+	form = synthetic_form(spec, length=length)
+
+	timings = {}
+	start = time.time()
+	for index in range(number):
+		generate.generate_html(spec, engine=engine)
+	timings["render"] = (time.time() - start) / number
+
+	start = time.time()
+	for index in range(number):
+		format.reform_from_html(spec, form, specialize=specialize)
+	timings["reform"] = (time.time() - start) / number
+	return timings
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(
+		prog="python -m canonical_args.frontend.profile",
+		description="profile generate_html and reform_from_html for an "
+					"argspec, with synthetic form data.")
+	parser.add_argument("spec",
+						help="a .json or .py file, or a module, holding "
+							 "the argspec. module[:attribute]")
+	parser.add_argument("--attr", default="argspec",
+						help="the module attribute holding the argspec "
+							 "(default: %(default)s)")
+	parser.add_argument("-n", "--number", type=int, default=100,
+						help="calls per phase (default: %(default)s)")
+	parser.add_argument("--length", type=int, default=3,
+						help="entries per unstructured list and dict "
+							 "(default: %(default)s)")
+	parser.add_argument("--engine", default="nested",
+						choices=sorted(generate.ENGINES),
+						help="the generate_html engine "
+							 "(default: %(default)s)")
+	parser.add_argument("--compiled", action="store_true",
+						help="compile the spec once up front")
+	parser.add_argument("--specialize", action="store_true",
+						help="reform with a function generated for the "
+							 "spec, after checking it agrees with the "
+							 "interpreter on the synthetic form")
+	parser.add_argument("--top", type=int, default=15,
+						help="hottest fields to show (default: %(default)s)")
+	parser.add_argument("--cprofile", metavar="FILE",
+						help="also dump cProfile stats to FILE")
+	parser.add_argument("--stacks", metavar="FILE",
+						help="also dump sampled, collapsed stacks to FILE, "
+							 "for flamegraph.pl or speedscope")
+	args = parser.parse_args(argv)
+
+	spec = load_spec(args.spec, args.attr)
+	if args.specialize:
+		codegen.verify(spec, [synthetic_form(spec, length=args.length)])
+
+	# a first, unmeasured, pass loads templates and warms caches
+	run(spec, number=1, length=args.length, engine=args.engine,
+		compiled=args.compiled, specialize=args.specialize)
+
+	timings = run(spec, args.number, args.length, args.engine, args.compiled,
+				  args.specialize)
+
+	# the breakdown is a separate pass, so as not to time the observer
+	aggregator = instrument.Aggregator()
+	with instrument.observing(aggregator):
+		run(spec, args.number, args.length, args.engine, args.compiled,
+			args.specialize)
+
+	if args.cprofile:
+		profiler = cProfile.Profile()
+		profiler.runcall(run, spec, args.number, args.length, args.engine,
+						 args.compiled, args.specialize)
+		profiler.dump_stats(args.cprofile)
+	if args.stacks:
+		sampler = StackSampler()
+		sampler.start()
+		try:
+			run(spec, args.number, args.length, args.engine, args.compiled,
+				args.specialize)
+		finally:
+			sampler.stop()
+		sampler.dump(args.stacks)
+
+	print("{:<10} {:>12}".format("phase", "mean (ms)"))
+	for phase in ("render", "reform"):
+		print("{:<10} {:>12.3f}".format(phase, timings[phase] * 1000))
+	print()
+	aggregator.report(limit=args.top)
+
+	if args.cprofile:
+		print()
+		pstats.Stats(args.cprofile).sort_stats("cumulative").print_stats(20)
+	if args.stacks:
+		print()
+		print("wrote {} stacks to {}".format(len(sampler.stacks), args.stacks))
+
+
+if __name__ == "__main__":
+	main()
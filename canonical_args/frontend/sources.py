@@ -6,11 +6,170 @@ available instantiated objects via a configurable method.
 """
 from __future__ import absolute_import
 
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import os
+import string
+import threading
+import time
 import types
+import warnings
 from canonical_args import check
 
+from . import instrument
+
 
 SOURCES = {}
+VERSIONS = {}
+
+# sentinel for cache misses
+_MISSING = object()
+
+# the number of threads ``fetch_all`` uses, unless ``set_pool`` is called
+POOL_SIZE = 8
+# the pool, and the pid of the process it was created in
+_pool = []
+_pool_lock = threading.Lock()
+
+
+class CachePolicy(object):
+	"""
+	How results from a registered source may be cached.
+
+	:param ttl: default None, seconds an entry stays fresh. ``None``
+		keeps entries until ``invalidate`` is called.
+	:type ttl: ``int`` or ``float``
+	:param int maxsize: default 128, the maximum number of entries
+		(the ``get_all`` listing, objects looked up by identifier and
+		``search`` pages) kept for the source.  The listing is never
+		evicted to make room for the others.
+	:param float refresh_ahead: default None, a fraction of ``ttl``.
+		A hit on an entry older than ``refresh_ahead * ttl`` returns
+		the cached entry immediately and reloads it in the background,
+		so requests never wait on the source while it is being hit.
+	"""
+	def __init__(self, ttl=None, maxsize=128, refresh_ahead=None):
+		if refresh_ahead is not None and not 0 < refresh_ahead < 1:
+			raise ValueError("refresh_ahead must be between 0 and 1")
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self.refresh_ahead = refresh_ahead
+
+
+class _SourceCache(object):
+	"""
+	a thread safe TTL/LRU store for a single source.
+
+	:param CachePolicy policy: the caching policy
+	:param callable on_load: called with the key whenever an entry is
+		stored, on first load and on every reload.
+	"""
+	def __init__(self, policy, on_load=None):
+		self.policy = policy
+		self.on_load = on_load
+		self._entries = OrderedDict()
+		self._refreshing = set()
+		self._generation = 0
+		self._lock = threading.Lock()
+
+	def get(self, key, load):
+		"""
+		get the entry for ``key``, calling ``load()`` to (re)build it
+		when missing or expired.
+		"""
+		entry = self._touch(key)
+
+		if entry is not None:
+			value, stored = entry
+			age = time.time() - stored
+			ttl = self.policy.ttl
+			if ttl is None or age < ttl:
+				if (ttl is not None and
+					self.policy.refresh_ahead is not None and
+					age >= ttl * self.policy.refresh_ahead):
+					self._refresh(key, load)
+				return value
+
+		value = load()
+		self.set(key, value)
+		return value
+
+	def lookup(self, key):
+		"""
+		get the fresh entry for ``key`` without loading it.
+
+		:returns: the entry, or ``_MISSING``
+		"""
+		entry = self._touch(key)
+		if entry is not None:
+			value, stored = entry
+			ttl = self.policy.ttl
+			if ttl is None or time.time() - stored < ttl:
+				return value
+		return _MISSING
+
+	def expired(self, key):
+		"""
+		:returns: ``bool``, whether the entry for ``key`` is kept but
+			past its ``ttl``, so the next ``get`` reloads it.
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+		ttl = self.policy.ttl
+		return (entry is not None and ttl is not None and
+				time.time() - entry[1] >= ttl)
+
+	def _touch(self, key):
+		# mark ``key`` as most recently used
+		with self._lock:
+			entry = self._entries.pop(key, None)
+			if entry is not None:
+				self._entries[key] = entry
+			return entry
+
+	def set(self, key, value):
+		with self._lock:
+			self._entries.pop(key, None)
+			self._entries[key] = (value, time.time())
+			while len(self._entries) > self.policy.maxsize:
+				# the least recently used entry, other than the listing
+				for oldest in self._entries:
+					if oldest != ("all", ):
+						break
+				else:
+					break
+				del self._entries[oldest]
+		if self.on_load is not None:
+			self.on_load(key)
+
+	def _refresh(self, key, load):
+		with self._lock:
+			if key in self._refreshing:
+				return
+			self._refreshing.add(key)
+			generation = self._generation
+
+		def reload():
+			try:
+				value = load()
+				# do not resurrect entries dropped by ``clear``
+				if self._generation == generation:
+					self.set(key, value)
+			except Exception:
+				# keep serving the current entry until it expires
+				pass
+			finally:
+				with self._lock:
+					self._refreshing.discard(key)
+
+		thread = threading.Thread(target=reload)
+		thread.daemon = True
+		thread.start()
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._generation += 1
 
 
 def register(import_string,
@@ -18,7 +177,13 @@ def register(import_string,
 			 cls_display_name,
 			 display_name_format,
 			 get_all,
-			 get_one):
+			 get_one,
+			 version=None,
+			 cache=None,
+			 get_many=None,
+			 timeout=None,
+			 search=None,
+			 project=None):
 	"""
 	register a class type to the sources, along with how to retrieve
 	available instances, and how to identify specific instances of the
@@ -34,36 +199,182 @@ def register(import_string,
 			cls_display_name = ["name", "version"]
 			display_name_format = "{name} ({version})"
 
+		Fields may be nested in format specs, eg. ``"{name:>{width}}"``
+		with ``cls_display_name = ["name", "width"]``.
+
 	:type cls_display_name: ``str`` or ``list``
 	:param callable get_all: a method for getting all available cls objects
 	:param callable get_one: a method which takes the primary identifier
 		``cls_name`` and returns the correct instance
+	:param callable version: optional, a method returning a token which
+		changes whenever the data behind ``get_all`` changes.  Used to
+		key rendered output caches.  A source with neither a ``version``
+		nor a ``cache`` policy can change unseen, so forms listing it
+		get no ``generate.etag`` (see ``versioned``).
+	:param CachePolicy cache: optional, cache results from the source
+		according to this policy.  Use ``invalidate`` after writes.
+		Objects looked up by identifier are cached under the same policy.
+	:param callable get_many: optional, a method which takes a ``list``
+		of primary identifiers and returns a ``list`` of the matching
+		instances, in the same order.  Used to batch lookups.
+	:param timeout: optional, seconds ``fetch_all`` waits on ``get_all``
+		before giving up on the source.
+	:type timeout: ``int`` or ``float``
+	:param callable search: optional, a method which takes a query
+		``str``, an ``int`` offset and an ``int`` limit, and returns a
+		``list`` of at most limit matching objects.  Sources with a
+		``search`` render as a search box fetching pages on demand
+		instead of listing every object from ``get_all``.
+	:param callable project: optional, a method returning only the
+		columns needed to list the available options, used by
+		``get_all`` in place of building every object.  Either a
+		sequence of rows, each a ``tuple`` of the ``cls_name`` value
+		followed by the ``cls_display_name`` values in order, or a
+		``dict`` of attribute name to a parallel sequence of values.
+
+			cls_name = "id"
+			cls_display_name = ["name", "version"]
+			project = lambda: [(1, "a", "1.0"), (2, "b", "2.1")]
+			project = lambda: {"id": [1, 2],
+							   "name": ["a", "b"],
+							   "version": ["1.0", "2.1"]}
 	"""
 	if isinstance(import_string, types.TypeType):
 		import_string = check.type_to_string(import_string)
 
+	display_attrs = cls_display_name
+	if not isinstance(display_attrs, list):
+		display_attrs = [display_attrs, ]
+
 	SOURCES[import_string] = {
 		"cls_name": cls_name,
 		"cls_display_name": cls_display_name,
 		"display_name_format": display_name_format,
 		"get_all": get_all,
-		"get_one": get_one
+		"get_one": get_one,
+		"get_many": get_many,
+		"version": version,
+		"timeout": timeout,
+		"search": search,
+		"project": project,
+		"display_attrs": display_attrs,
+		"formatter": _compile_format(display_name_format, display_attrs),
+		"cache": None
 	}
+	if cache is not None:
+		def on_load(key):
+			# only a new listing changes what is rendered, but any
+			# load of it may be new (eg. after it was evicted)
+			if key == ("all", ):
+				_bump(import_string)
 
-def _make_display_name(obj):
+		SOURCES[import_string]["cache"] = _SourceCache(
+			cache, on_load=on_load)
+	_bump(import_string)
+
+def _bump(import_string):
+	VERSIONS[import_string] = VERSIONS.get(import_string, 0) + 1
+
+def invalidate(import_string):
+	"""
+	signal that the data behind ``import_string`` has changed, so
+	anything derived from it (eg. rendered forms) is stale, and drop
+	any cached results for the source.
+
+	:param import_string: the import path of the object
+	:type import_string: ``str`` or ``types.TypeType``
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	source = SOURCES.get(import_string)
+	if source is not None and source["cache"] is not None:
+		source["cache"].clear()
+	_bump(import_string)
+
+def version(import_string):
+	"""
+	get the current version token for ``import_string``.  The token
+	changes on every ``register`` and ``invalidate`` call, whenever
+	the registered ``version`` method returns something new, and for
+	sources with a ``cache`` policy, whenever the cached listing
+	expires or is loaded again.
+
+	:param import_string: the import path of the object
+	:type import_string: ``str`` or ``types.TypeType``
+	:returns: ``str``
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	token = str(VERSIONS.get(import_string, 0))
+	source = SOURCES.get(import_string)
+	if source is None:
+		return token
+	# outputs rendered from an expired listing are stale, the next
+	# ``get_all`` reloads it and bumps the version again
+	if source["cache"] is not None and source["cache"].expired(("all", )):
+		token += "+"
+	if source["version"] is not None:
+		token += ":" + str(source["version"]())
+	return token
+
+def versioned(import_string):
+	"""
+	:returns: ``bool``, whether ``version`` follows every change to
+		what ``get_all`` returns for ``import_string``: the source was
+		registered with a ``version`` method, or with a ``cache`` policy
+		(whose listing only changes on reload, expiry or
+		``invalidate``).
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	source = SOURCES[import_string]
+	return source["version"] is not None or source["cache"] is not None
+
+def _compile_format(display_name_format, attrs):
+	"""
+	build a callable formatting a sequence of ``attrs`` values with
+	``display_name_format``, rewriting the named fields to positional
+	ones once rather than building a ``dict`` per display name.
+	"""
+	positions = dict((attr, index) for index, attr in enumerate(attrs))
+	parts = []
+	try:
+		for literal, field, spec, conversion in \
+				string.Formatter().parse(display_name_format):
+			parts.append(literal.replace("{", "{{").replace("}", "}}"))
+			if field is None:
+				continue
+			# split "attr.sub" or "attr[0]" into "attr" and the rest
+			head = field
+			for delimeter in ".[":
+				head = head.split(delimeter, 1)[0]
+			if head not in positions or "{" in (spec or ""):
+				raise ValueError(field)
+			parts.append("{" + str(positions[head]) + field[len(head):])
+			if conversion:
+				parts.append("!" + conversion)
+			if spec:
+				parts.append(":" + spec)
+			parts.append("}")
+	except ValueError:
+		# leave unusual formats (eg. the nested field of
+		# "{name:>{width}}") to fail, or not, as they always have
+		def keyword_format(*values):
+			return display_name_format.format(**dict(zip(attrs, values)))
+		return keyword_format
+
+	return "".join(parts).format
+
+def _make_display_name(obj, source=None):
 	"""
 	make human readable display names from a list of attrs
 	"""
-	import_string = check.type_to_string(type(obj))
-	formatstring = SOURCES[import_string]["display_name_format"]
-	formatdict = {}
-	formatattrs = SOURCES[import_string]["cls_display_name"]
-	if not isinstance(formatattrs, list):
-		formatattrs = list([formatattrs, ])
-	for attr in formatattrs:
-		formatdict[attr] = getattr(obj, attr)
-	return formatstring.format(**formatdict)
+	if source is None:
+		source = SOURCES[check.type_to_string(type(obj))]
+	return source["formatter"](
+		*[getattr(obj, attr) for attr in source["display_attrs"]])
 
+@instrument.fetch_timer("get_all")
 def get_all(import_string, raw=False):
 	"""
 	get all instantiated options for a cls arg of type
@@ -77,29 +388,318 @@ def get_all(import_string, raw=False):
 		else, returns ``tuple`` of two ``list``s: the
 		primary indentifiers for the objects, and the
 		dispaly names for the objects.
+
+	.. note :: when the source was registered with a ``cache`` policy,
+		the returned lists are shared between callers. Do not mutate.
 	"""
 	if isinstance(import_string, types.TypeType):
 		import_string = check.type_to_string(import_string)
-	objs = SOURCES[import_string]["get_all"]()
-	
+	source = SOURCES[import_string]
+
+	if raw and (source["cache"] is None or source["project"] is not None):
+		return source["get_all"]()
+
+	if source["cache"] is None:
+		objs, ids, names = _load_all(source)
+	else:
+		objs, ids, names = source["cache"].get(
+			("all", ), lambda: _load_all(source))
+
 	if raw:
 		return objs
 
 	# return ids and names
-	return [getattr(obj, SOURCES[import_string]["cls_name"]) for obj in objs],\
-		   [_make_display_name(obj) for obj in objs]
+	return ids, names
+
+def _load_all(source):
+	"""
+	call the source ``get_all`` and build the ids and display names
+	in a single pass.  Sources registered with ``project`` build no
+	objects, and return None for them.
+	"""
+	if source["project"] is not None:
+		ids, names = _project(source)
+		return None, ids, names
+	objs = list(source["get_all"]())
+	ids, names = _ids_and_names(source, objs)
+	return objs, ids, names
+
+def _project(source):
+	"""
+	build the ids and display names from the source ``project``
+	rows or columns.
+	"""
+	projected = source["project"]()
+	formatter = source["formatter"]
+
+	if isinstance(projected, dict):
+		ids = list(projected[source["cls_name"]])
+		columns = [projected[attr] for attr in source["display_attrs"]]
+		return ids, [formatter(*values) for values in zip(*columns)]
+
+	ids = []
+	names = []
+	for row in projected:
+		ids.append(row[0])
+		names.append(formatter(*row[1:]))
+	return ids, names
+
+def _ids_and_names(source, objs):
+	ids = []
+	names = []
+	cls_name = source["cls_name"]
+	for obj in objs:
+		ids.append(getattr(obj, cls_name))
+		names.append(_make_display_name(obj, source))
+	return ids, names
+
+def searchable(import_string):
+	"""
+	:returns: ``bool``, whether ``import_string`` was registered with a
+		``search`` method.
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	return SOURCES[import_string]["search"] is not None
+
+@instrument.fetch_timer("search")
+def search(import_string, query, offset=0, limit=20):
+	"""
+	get a page of the options for a cls arg of type ``import_string``
+	matching ``query``, through its registered ``search`` method.
+
+	:param import_string: the import path of the object
+	:type import_string: ``str`` or ``types.TypeType``
+	:param str query: the text to search for
+	:param int offset: default 0, the number of matches to skip
+	:param int limit: default 20, the maximum number of matches
+	:raises ValueError: if the source has no ``search`` method.
+	:returns: ``tuple`` of two ``list``s, as ``get_all``.
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	source = SOURCES[import_string]
+	if source["search"] is None:
+		raise ValueError("source '{}' is not searchable".format(import_string))
 
+	def load():
+		return _ids_and_names(source, source["search"](query, offset, limit))
+
+	if source["cache"] is None:
+		return load()
+	return source["cache"].get(("search", query, offset, limit), load)
+
+@instrument.fetch_timer("get_one")
 def get_one(import_string, primary_identifier, raw=False):
 	"""
+	get a single instantiated option for a cls arg of type
+	``import_string``.
 
+	:param import_string: the import path of the object
+	:type import_string: ``str`` or ``types.TypeType``
+	:param primary_identifier: the ``cls_name`` value of the object
+	:param bool raw: default False, return the object itself
+	:returns: if ``raw``, returns the object. else, returns
+		``tuple`` of the primary identifier and display name.
 	"""
 	if isinstance(import_string, types.TypeType):
 		import_string = check.type_to_string(import_string)
-	obj = SOURCES[import_string]["get_one"](primary_identifier)
+	source = SOURCES[import_string]
+
+	if source["cache"] is None:
+		obj = source["get_one"](primary_identifier)
+	else:
+		obj = source["cache"].get(
+			("one", primary_identifier),
+			lambda: source["get_one"](primary_identifier))
 
 	if raw:
 		return obj
 
-	return getattr(obj, SOURCES[import_string]["cls_name"]),\
-		   _make_display_name(obj)
+	return getattr(obj, source["cls_name"]),\
+		   _make_display_name(obj, source)
+
+@instrument.fetch_timer("get_many")
+def get_many(import_string, primary_identifiers, raw=False):
+	"""
+	get several instantiated options for a cls arg of type
+	``import_string`` at once.  Uses the registered ``get_many`` for
+	a single batched lookup when available, else ``get_one`` for each
+	identifier not already cached.
+
+	:param import_string: the import path of the object
+	:type import_string: ``str`` or ``types.TypeType``
+	:param list primary_identifiers: the ``cls_name`` values
+	:param bool raw: default False, return the objects themselves
+	:raises ValueError: if the source returns fewer objects than
+		identifiers asked for.
+	:returns: ``list`` in ``primary_identifiers`` order. if ``raw``,
+		of objects, else of ``tuple``s of primary identifier and
+		display name.
+	"""
+	if isinstance(import_string, types.TypeType):
+		import_string = check.type_to_string(import_string)
+	source = SOURCES[import_string]
+	cache = source["cache"]
+
+	found = {}
+	missing = []
+	seen = set()
+	for identifier in primary_identifiers:
+		if identifier in seen:
+			continue
+		seen.add(identifier)
+		if cache is not None:
+			obj = cache.lookup(("one", identifier))
+			if obj is not _MISSING:
+				found[identifier] = obj
+				continue
+		missing.append(identifier)
+
+	if missing:
+		if source["get_many"] is not None:
+			objs = list(source["get_many"](missing))
+		else:
+			objs = [source["get_one"](identifier) for identifier in missing]
+		if len(objs) < len(missing):
+			raise ValueError("source '{}' has no objects for {}".format(
+				import_string, _absent(source, missing, objs)))
+		for identifier, obj in zip(missing, objs):
+			found[identifier] = obj
+			if cache is not None:
+				cache.set(("one", identifier), obj)
+
+	objs = [found[identifier] for identifier in primary_identifiers]
+	if raw:
+		return objs
+
+	return [(getattr(obj, source["cls_name"]), _make_display_name(obj, source))
+			for obj in objs]
+
+def _absent(source, identifiers, objs):
+	"""
+	the ``identifiers`` none of ``objs`` has, compared as strings (form
+	submitted identifiers are), or else those past the end of ``objs``.
+	"""
+	returned = set(str(getattr(obj, source["cls_name"], None)) for obj in objs)
+	absent = [identifier for identifier in identifiers
+			  if str(identifier) not in returned]
+	return absent or identifiers[len(objs):]
+
+def set_pool(pool):
+	"""
+	set the thread pool ``fetch_all`` submits ``get_all`` calls to.
+
+	:param pool: the pool, or None to create one of ``POOL_SIZE``
+		threads on next use.
+	:type pool: ``multiprocessing.pool.ThreadPool``
+	"""
+	with _pool_lock:
+		del _pool[:]
+		if pool is not None:
+			_pool.append((pool, os.getpid()))
+
+def get_pool():
+	"""
+	:returns: the ``multiprocessing.pool.ThreadPool`` used by
+		``fetch_all``.  A forked child gets a new pool of ``POOL_SIZE``
+		threads, as the threads of its parent's pool do not survive the
+		fork.
+	"""
+	with _pool_lock:
+		pid = os.getpid()
+		if not _pool or _pool[0][1] != pid:
+			# the parent's pool is left alone, it is not ours to close
+			del _pool[:]
+			_pool.append((ThreadPool(POOL_SIZE), pid))
+		return _pool[0][0]
+
+
+class Fetch(object):
+	"""
+	The pending result of a ``get_all`` started by ``fetch_all``.
+
+	:param str import_string: the import path of the object
+	:param result: the ``multiprocessing.pool.AsyncResult``, or None
+		to call ``get_all`` when first asked.
+	:param deadline: the ``time.time()`` to stop waiting at, or None.
+	:param value: optional, the already fetched ids and display names.
+
+	.. attribute :: failed
+
+		whether the source failed, and ``get`` fell back to no options.
+		Output rendered from such a fetch should not be cached.
+	"""
+	def __init__(self, import_string, result=None, deadline=None,
+				 value=_MISSING):
+		self.import_string = import_string
+		self.failed = False
+		self._result = result
+		self._deadline = deadline
+		self._value = value
+
+	def get(self):
+		"""
+		wait for the result.  A source which fails, or does not answer
+		before its ``timeout``, warns, sets ``failed`` and yields no
+		options.
+
+		:returns: ``tuple`` of ``list``s, the primary identifiers and the
+			display names, as ``get_all``.
+		"""
+		if self._value is not _MISSING:
+			return self._value
+
+		try:
+			if self._result is None:
+				self._value = get_all(self.import_string)
+			elif self._deadline is None:
+				self._value = self._result.get()
+			else:
+				self._value = self._result.get(
+					max(0, self._deadline - time.time()))
+		except Exception as e:
+			warnings.warn(
+				"source '{}' unavailable: {!r}".format(self.import_string, e),
+				RuntimeWarning)
+			self.failed = True
+			self._value = ([], [])
+		return self._value
+
+
+def fetch_all(import_strings, pool=None):
+	"""
+	start ``get_all`` for every source in ``import_strings``
+	concurrently.  Sources whose listing is already cached, or lone
+	sources without a ``timeout``, are resolved in the calling thread.
+
+	:param list import_strings: the import paths, duplicates are
+		fetched once.
+	:param pool: default ``get_pool()``, the pool to fetch on.
+	:type pool: ``multiprocessing.pool.ThreadPool``
+	:returns: ``dict`` of import string to ``Fetch``.
+	"""
+	import_strings = set(import_strings)
+	fetches = {}
+	now = time.time()
+
+	for import_string in import_strings:
+		source = SOURCES[import_string]
+		cached = (source["cache"] is not None and
+				  source["cache"].lookup(("all", )) is not _MISSING)
+
+		if cached or (len(import_strings) == 1 and source["timeout"] is None):
+			fetches[import_string] = Fetch(import_string)
+			continue
+
+		if pool is None:
+			pool = get_pool()
+		deadline = None
+		if source["timeout"] is not None:
+			deadline = now + source["timeout"]
+		fetches[import_string] = Fetch(
+			import_string,
+			pool.apply_async(get_all, (import_string, )),
+			deadline)
 
+	return fetches
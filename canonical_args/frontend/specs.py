@@ -0,0 +1,124 @@
+"""
+Provide a register/lookup interface for argspecs, by name.  A
+registered name may be passed anywhere a spec is, eg. to
+``generate_html`` and ``reform_from_html``, and is compiled once.
+``warm`` prepares every registered spec ahead of the first request.
+"""
+from __future__ import absolute_import
+
+import time
+import warnings
+
+from . import sources
+
+
+SPECS = {}
+
+
+def register(name, spec, delimeter="-", **options):
+	"""
+	register an argspec under ``name``.  Replaces any spec already
+	registered under it.
+
+	:param str name: the name to look the spec up by
+	:param dict spec: the canonical_args argspec dict
+	:param str delimeter: default ``"-"``, as ``generate_html``
+	:param options: optional, the ``generate_html`` keyword arguments
+		the spec is rendered with (eg. ``lazy``, ``fragment_url`` or
+		``cache``), used by ``render``, ``warm``, ``generate.etag`` and
+		``views.form_view``.
+	"""
+	SPECS[name] = {
+		"spec": spec,
+		"delimeter": delimeter,
+		"options": options,
+		"plan": None
+	}
+
+def get(name):
+	"""
+	get the compiled spec registered under ``name``, compiling it on
+	first use.
+
+	:param str name: the registered name
+	:raises KeyError: if nothing is registered under ``name``.
+	:returns: ``plan.Plan``
+	"""
+	# imported here, plan imports this module
+	from .html import plan
+
+	entry = SPECS[name]
+	if entry["plan"] is None:
+		entry["plan"] = plan.compile_spec(entry["spec"],
+										  delimeter=entry["delimeter"])
+	return entry["plan"]
+
+def options(spec, overrides):
+	"""
+	the ``generate_html`` keyword arguments to render ``spec`` with:
+	its registered options, when it is a registered name, updated by
+	``overrides``.
+
+	:param spec: a registered name, or any other spec
+	:param dict overrides: the caller's keyword arguments
+	:returns: ``dict``, a new one
+	"""
+	merged = {}
+	if isinstance(spec, basestring) and spec in SPECS:
+		merged.update(SPECS[spec]["options"])
+	merged.update(overrides)
+	return merged
+
+def render(name, **overrides):
+	"""
+	render the spec registered under ``name`` with ``generate_html``,
+	with its registered options updated by ``overrides``.
+
+	:returns: str, as ``generate_html``
+	"""
+	from .html import generate
+
+	return generate.generate_html(get(name), **options(name, overrides))
+
+def warm(names=None):
+	"""
+	prepare every registered spec ahead of its first request: load the
+	templates, compile the spec and its specialized reform function,
+	list every source it uses (filling any source cache) and render it
+	once with its registered options (filling the ``"macro"`` engine
+	skeletons, any ``cache`` and the ``static_url`` assets).
+
+	Starts no threads, so it is safe to call in a pre-forking server's
+	master process: the workers then inherit everything prepared here
+	rather than each preparing it on its first request.
+
+	:param list names: default every registered name, the specs to warm
+	:returns: ``dict`` of name to the seconds spent warming it.
+	"""
+	from .html import codegen, generate
+
+	generate.warm_up()
+	if names is None:
+		names = sorted(SPECS)
+
+	timings = {}
+	for name in names:
+		start = time.time()
+		compiled = get(name)
+		codegen.compile_reform(compiled)
+
+		# fetched here, rather than on the ``fetch_all`` thread pool
+		fetched = {}
+		try:
+			for import_string in compiled.sources:
+				if not sources.searchable(import_string):
+					fetched[import_string] = sources.get_all(import_string)
+		except Exception as e:
+			# rendering now would cache a form missing the options
+			warnings.warn("not rendering '{}', source '{}' unavailable: "
+						  "{!r}".format(name, import_string, e),
+						  RuntimeWarning)
+		else:
+			render(name, fetched=fetched)
+		timings[name] = time.time() - start
+	return timings
@@ -2,7 +2,7 @@ from flask import Flask, request, render_template
 from pprint import pformat
 app = Flask(__name__)
 
-from canonical_args.frontend.html import generate, format
+from canonical_args.frontend.html import generate, wsgi
 from canonical_args import structure
 
 # from canonical_args.frontend.html import format
@@ -64,14 +64,13 @@ argspec = {
 @app.route("/", methods=["POST", "GET"])
 def index():
 	if request.method == "GET":
-		return generate.generate_html(argspec)
+		return generate.generate_html(argspec,
+									  lazy=True,
+									  fragment_url="/fragment")
 	elif request.method == "POST":
-		flatdict = dict(request.form)
-
-		print flatdict
-
 		try:
-			reconstdict = format.reform_from_html(argspec, flatdict)
+			# read straight from the body, request.form is never parsed
+			reconstdict = wsgi.reform_from_environ(argspec, request.environ)
 			structure.checkspec(argspec,
 								reconstdict["args"],
 								reconstdict["kwargs"])
@@ -82,5 +81,12 @@ def index():
 		return json.dumps(reconstdict, sort_keys=True)
 
 
+@app.route("/fragment", methods=["GET"])
+def fragment():
+	return generate.render_fragment(argspec,
+									request.args["field"],
+									request.args["option"])
+
+
 if __name__ == "__main__":
 	app.run()
\ No newline at end of file
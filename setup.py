@@ -13,6 +13,7 @@ setup(name="canonical_args_frontend",
       maintainer_email="shonte.amatogrill@gmail.com",
       url="https://github.com/shonteag/canonical_args_frontend",
       packages=find_packages(exclude=["test", "tests"]),
+      include_package_data=True,
       classifiers=[
           "Programming Language :: Python :: 2.7",
           "Topic :: Software Development :: Libraries :: Python Modules",
@@ -0,0 +1,36 @@
+"""
+Tests of the specialized reform functions.
+
+	python -m unittest discover -s tests -t .
+"""
+import os
+import sys
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+	"benchmarks"))
+
+import verify_codegen
+
+
+class VerifyTest(unittest.TestCase):
+	"""
+	the specialized functions agree with ``format.reform_from_html`` on
+	mutated forms of every benchmark shape.
+	"""
+	def test_benchmark_shapes(self):
+		with warnings.catch_warnings():
+			# unmatched choices warn on every reform
+			warnings.simplefilter("ignore")
+			checked = verify_codegen.check(count=20)
+		self.assertEqual(sorted(checked), sorted(
+			(shape, size) for shape in verify_codegen.SHAPES
+			for size in verify_codegen.SIZES))
+		for forms in checked.values():
+			self.assertEqual(forms, 21)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests of reforming submitted forms.
+
+	python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from canonical_args.frontend.html import format
+
+
+SPEC = {
+	"args": [
+		{
+			"name": "count",
+			"type": "int",
+			"values": None
+		}
+	],
+	"kwargs": {}
+}
+
+
+class ReformFromJSONTest(unittest.TestCase):
+
+	def test_payload(self):
+		self.assertEqual(
+			format.reform_from_json(SPEC, '{"args": [3], "kwargs": {}}'),
+			{"args": [3], "kwargs": {}})
+
+	def test_payload_not_a_dict(self):
+		for payload in ('[3]', '3', 'null', '"args"', [3], None):
+			self.assertRaises(ValueError, format.reform_from_json, SPEC,
+							  payload)
+
+
+if __name__ == "__main__":
+	unittest.main()
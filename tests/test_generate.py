@@ -0,0 +1,44 @@
+"""
+Tests of rendering forms.
+
+	python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from canonical_args.frontend import specs
+from canonical_args.frontend.html import generate
+
+
+SPEC = {
+	"args": [
+		{
+			"name": "count",
+			"type": "int",
+			"values": None
+		}
+	],
+	"kwargs": {}
+}
+
+
+class EtagTest(unittest.TestCase):
+
+	def setUp(self):
+		specs.register("test-etag", SPEC, lazy=True)
+
+	def tearDown(self):
+		specs.SPECS.pop("test-etag", None)
+
+	def test_registered_options(self):
+		self.assertEqual(generate.etag("test-etag"),
+						 generate.etag(SPEC, lazy=True))
+		self.assertNotEqual(generate.etag("test-etag"),
+							generate.etag(SPEC))
+
+	def test_overrides(self):
+		self.assertEqual(generate.etag("test-etag", lazy=False),
+						 generate.etag(SPEC))
+
+
+if __name__ == "__main__":
+	unittest.main()
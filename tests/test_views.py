@@ -0,0 +1,52 @@
+"""
+Tests of answering requests for forms.
+
+	python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from canonical_args.frontend import specs
+from canonical_args.frontend.html import generate, views
+
+
+SPEC = {
+	"args": [
+		{
+			"name": "count",
+			"type": "int",
+			"values": None
+		}
+	],
+	"kwargs": {}
+}
+
+
+class FormViewTest(unittest.TestCase):
+
+	def setUp(self):
+		specs.register("test-view", SPEC, lazy=True, action="/submit")
+
+	def tearDown(self):
+		specs.SPECS.pop("test-view", None)
+
+	def test_registered_options(self):
+		html, headers = views.form_view("test-view")
+		self.assertEqual(html, generate.generate_html(
+			SPEC, lazy=True, action="/submit"))
+		self.assertEqual(headers["ETag"], generate.etag(
+			SPEC, lazy=True, action="/submit"))
+
+	def test_overrides(self):
+		html, headers = views.form_view("test-view", action="/other")
+		self.assertEqual(html, generate.generate_html(
+			SPEC, lazy=True, action="/other"))
+
+	def test_not_modified(self):
+		html, headers = views.form_view("test-view")
+		html, revalidated = views.form_view("test-view", headers["ETag"])
+		self.assertIsNone(html)
+		self.assertEqual(revalidated["ETag"], headers["ETag"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of reforming form submissions straight from WSGI request bodies.
+
+	python -m unittest discover -s tests -t .
+"""
+import io
+import unittest
+import urllib
+
+from canonical_args.frontend.html import wsgi
+
+
+SPEC = {
+	"args": [
+		{
+			"name": "text",
+			"type": "str",
+			"values": None
+		}
+	],
+	"kwargs": {
+		"mapping": {
+			"type": "dict",
+			"values": None
+		}
+	}
+}
+
+FIELDS = [("text", u"caf\xe9"), ("text", "str"),
+		  ("mapping[0]", u"cl\xe9"), ("mapping[0]", u"valeur \xe9"),
+		  ("mapping[0]", "str")]
+
+EXPECTED = {
+	"args": [u"caf\xe9"],
+	"kwargs": {
+		"mapping": {u"cl\xe9": u"valeur \xe9"}
+	}
+}
+
+
+def environ(content_type, body):
+	return {
+		"CONTENT_TYPE": content_type,
+		"CONTENT_LENGTH": str(len(body)),
+		"wsgi.input": io.BytesIO(body)
+	}
+
+def urlencoded():
+	return environ("application/x-www-form-urlencoded", urllib.urlencode(
+		[(name, value.encode("utf-8")) for name, value in FIELDS]))
+
+def multipart():
+	boundary = "boundary1234"
+	parts = []
+	for name, value in FIELDS:
+		parts.append("--{}\r\n"
+					 "Content-Disposition: form-data; name=\"{}\"\r\n"
+					 "\r\n"
+					 "{}\r\n".format(boundary, name, value.encode("utf-8")))
+	parts.append("--{}--\r\n".format(boundary))
+	return environ("multipart/form-data; boundary={}".format(boundary),
+				   "".join(parts))
+
+
+class NonASCIITest(unittest.TestCase):
+	"""
+	non-ASCII values are decoded to ``unicode``, and kept as it.
+	"""
+	def test_urlencoded(self):
+		self.assertEqual(wsgi.reform_from_environ(SPEC, urlencoded()),
+						 EXPECTED)
+
+	def test_multipart(self):
+		self.assertEqual(wsgi.reform_from_environ(SPEC, multipart()),
+						 EXPECTED)
+
+	def test_specialized(self):
+		for body in (urlencoded(), multipart()):
+			self.assertEqual(
+				wsgi.reform_from_environ(SPEC, body, specialize=True),
+				EXPECTED)
+
+
+if __name__ == "__main__":
+	unittest.main()